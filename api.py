@@ -17,6 +17,7 @@ Endpoints:
 
 import os
 import json
+import shutil
 import tempfile
 from contextlib import asynccontextmanager
 
@@ -82,7 +83,9 @@ def save_upload(file: UploadFile) -> str:
     """
     suffix = os.path.splitext(file.filename or "upload")[1] or ".pdf"
     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(file.file.read())
+        # Stream in 1 MiB chunks — avoids buffering the whole upload in
+        # memory before writing it out.
+        shutil.copyfileobj(file.file, tmp, length=1024 * 1024)
         return tmp.name
 
 
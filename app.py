@@ -1,17 +1,21 @@
 import streamlit as st
-import sys
 import os
+import re
+import shutil
 import tempfile
+import threading
 import time
-from fpdf import FPDF
-from src.agents import improve_document, resume_improvement
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from src.backend import process_document, get_history, get_dashboard_stats, ask_document
 
 st.set_page_config(page_title="AI Document Intelligence", page_icon="📄", layout="wide")
 
-st.markdown("""
+@st.cache_resource
+def _css() -> str:
+    """Build the app stylesheet once per process."""
+    return """
 <style>
     .stApp { background-color: #0f1117; }
     .main-header { text-align: center; padding: 20px 0; color: #ffffff; }
@@ -120,7 +124,72 @@ st.markdown("""
         font-size: 0.8em; font-weight: bold; white-space: nowrap;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_css(), unsafe_allow_html=True)
+
+# ── Lazy backend import ───────────────────────────────────────────────
+# Importing src.backend pulls in LangGraph, Groq, ChromaDB and the
+# embedding model — multi-second on cold start. Defer it until a tab
+# actually needs the backend; cache_resource makes the import happen
+# exactly once per process.
+@st.cache_resource
+def _backend():
+    from src import backend
+    return backend
+
+@st.cache_resource
+def _agents():
+    from src import agents
+    return agents
+
+
+# ── Cached data access ────────────────────────────────────────────────
+# Streamlit reruns the whole script on every widget interaction, so the
+# History/Dashboard tabs would otherwise hit SQLite on every click
+# anywhere in the app. The version token is bumped in session state when
+# a new analysis lands, so unrelated reruns keep hitting the cache while
+# new results show up immediately. TTL covers rows written by other
+# processes (API).
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_history(version: int = 0):
+    return _backend().get_history()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_stats(version: int = 0):
+    return _backend().get_dashboard_stats()
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _ask_cached(question: str, filename: str, language: str) -> str:
+    """Memoize Q&A answers — repeat clicks on the same suggested question
+    (or re-asking after a tab switch) skip the LLM + vector search."""
+    return _backend().ask_document(question, filename, language)
+
+def _ask(question: str, filename: str, language: str) -> str:
+    """Cached ask that never memoizes failures: answer_question reports
+    errors as "Error ..." strings rather than raising, so a transient
+    outage would otherwise stick until the entry is evicted. Evicting the
+    entry lets the next ask retry."""
+    answer = _ask_cached(question, filename, language)
+    if answer.startswith("Error"):
+        _ask_cached.clear(question, filename, language)
+    return answer
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _analyze_cached(pdf_bytes: bytes, filename: str) -> dict:
+    """Run the full multi-agent pipeline once per unique PDF.
+
+    Keyed on the raw file bytes, so re-uploading the same document skips
+    every LLM round-trip and returns the memoized result instantly.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(pdf_bytes)
+        tmp_path = tmp.name
+    try:
+        return _backend().process_document(tmp_path, filename)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
 
 # ── Session state ─────────────────────────────────────────────────────
 for key, default in [
@@ -128,7 +197,7 @@ for key, default in [
     ("qa_history",      []),
     ("improve_result",  None),
     ("last_raw_text",   None),
-    ("improve_file",    None),
+    ("improve_file_bytes", None),
     ("improve_thread_id", None),   # CHECKPOINTING: stored per run for resume
 ]:
     if key not in st.session_state:
@@ -144,6 +213,28 @@ st.markdown("""
 st.divider()
 
 # ── Helpers ───────────────────────────────────────────────────────────
+_RISK_SECTION_RE    = re.compile(r"HIGH RISK|MEDIUM RISK|LOW RISK")
+_RISK_SECTION_STYLE = {
+    "HIGH RISK":   ("risk-high",   "🔴 High Risk"),
+    "MEDIUM RISK": ("risk-medium", "🟡 Medium Risk"),
+    "LOW RISK":    ("risk-low",    "🟢 Low Risk"),
+}
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _split_risks(risks_text: str) -> list:
+    """Slice the risk analysis into (css, label, content) sections.
+
+    The text never changes for a given result, so the scan runs once per
+    document instead of on every rerun of the results tab.
+    """
+    matches  = list(_RISK_SECTION_RE.finditer(risks_text))
+    sections = []
+    for i, m in enumerate(matches):
+        css, label = _RISK_SECTION_STYLE[m.group(0)]
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(risks_text)
+        sections.append((css, label, risks_text[m.end():end].strip()))
+    return sections
+
 AGENTS = [
     ("⚙️", "Document Processor", "Extracts text from PDF"),
     ("📝", "Summarizer",          "Generates concise summary"),
@@ -158,19 +249,34 @@ IMPROVE_AGENTS = [
     ("✅", "Verifier Agent",     "Adversarial quality scoring (t=0)"),
 ]
 
+_AGENT_CARD_TMPL = '<div class="{css}"><strong>{badge} {name}</strong><br><small style="color:#6c7086;">{desc}</small></div>'
+
+# The idle pipeline never changes — format it once at import instead of
+# re-building five f-strings on every rerun.
+_AGENT_PIPELINE_IDLE_HTML = "".join(
+    _AGENT_CARD_TMPL.format(css="agent-card", badge=icon, name=name, desc=desc)
+    for icon, name, desc in AGENTS
+)
+
 def render_agents(active_idx=None, done_up_to=None):
+    # One st.markdown for all five cards — a single frontend delta
+    # instead of five per call (and the animation loop calls this often).
+    cards = []
     for i, (icon, name, desc) in enumerate(AGENTS):
         if done_up_to is not None and i < done_up_to: css, badge = "agent-done", "✅"
         elif active_idx is not None and i == active_idx: css, badge = "agent-active", "🔄"
         else: css, badge = "agent-card", icon
-        st.markdown(f'<div class="{css}"><strong>{badge} {name}</strong><br><small style="color:#6c7086;">{desc}</small></div>', unsafe_allow_html=True)
+        cards.append(_AGENT_CARD_TMPL.format(css=css, badge=badge, name=name, desc=desc))
+    st.markdown("".join(cards), unsafe_allow_html=True)
 
 def render_improve_agents(active_idx=None, done_up_to=None):
+    cards = []
     for i, (icon, name, desc) in enumerate(IMPROVE_AGENTS):
         if done_up_to is not None and i < done_up_to: css, badge = "improve-agent-done", "✅"
         elif active_idx is not None and i == active_idx: css, badge = "improve-agent-active", "🔄"
         else: css, badge = "improve-agent-card", icon
-        st.markdown(f'<div class="{css}"><strong>{badge} {name}</strong><small style="color:#6c7086;margin-left:8px;">{desc}</small></div>', unsafe_allow_html=True)
+        cards.append(f'<div class="{css}"><strong>{badge} {name}</strong><small style="color:#6c7086;margin-left:8px;">{desc}</small></div>')
+    st.markdown("".join(cards), unsafe_allow_html=True)
 
 def get_risk_color(score):
     if score <= 20: return "risk-score-low",    "🟢 Low Risk"
@@ -193,30 +299,78 @@ def get_doc_type_badge(doc_type):
     css, label = badges.get(doc_type, ("doc-type-report", f"📄 {doc_type}"))
     return f'<span class="doc-type-badge {css}">{label}</span>'
 
-def export_to_pdf(result):
-    pdf = FPDF(); pdf.add_page()
-    pdf.set_font("Helvetica", "B", 16)
+# PDF generation is deterministic CPU work over a handful of strings —
+# cache the bytes so re-rendering the results tab doesn't re-run FPDF
+# layout on every rerun. Explicit primitive args keep Streamlit's hasher
+# on the fast path.
+
+# Prefer a system DejaVu TTF so PDFs carry full unicode (Arabic/French
+# analyses render correctly) and the per-section latin-1 round-trips
+# disappear; core Helvetica stays as the fallback.
+_DEJAVU_DIR = "/usr/share/fonts/truetype/dejavu"
+
+@st.cache_resource
+def _pdf_font() -> tuple:
+    regular = os.path.join(_DEJAVU_DIR, "DejaVuSans.ttf")
+    bold = os.path.join(_DEJAVU_DIR, "DejaVuSans-Bold.ttf")
+    if os.path.exists(regular) and os.path.exists(bold):
+        return ("DejaVu", regular, bold)
+    return ("Helvetica", None, None)
+
+def _new_pdf() -> tuple:
+    """Return (pdf, family) with the unicode font registered when available."""
+    from fpdf import FPDF  # deferred: only needed when a PDF is exported
+
+    pdf = FPDF()
+    family, regular, bold = _pdf_font()
+    if regular:
+        pdf.add_font(family, "", regular)
+        pdf.add_font(family, "B", bold)
+    pdf.add_page()
+    return pdf, family
+
+def _pdf_text(text: str) -> str:
+    """Sanitize text for core fonts; pass through untouched for unicode fonts."""
+    if _pdf_font()[1]:
+        return text
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _report_pdf_bytes(filename: str, language: str, risk_score: int,
+                      summary: str, key_info: str, risks: str, report: str) -> bytes:
+    pdf, font = _new_pdf()
+    pdf.set_font(font, "B", 16)
     pdf.cell(0, 10, "Document Analysis Report", ln=True, align="C"); pdf.ln(5)
-    pdf.set_font("Helvetica", "", 11)
-    for label, val in [("Document", result["filename"]), ("Language", result["language"]), ("Risk Score", f"{result['risk_score']}/100")]:
+    pdf.set_font(font, "", 11)
+    for label, val in [("Document", filename), ("Language", language), ("Risk Score", f"{risk_score}/100")]:
         pdf.cell(0, 8, f"{label}: {val}", ln=True)
     pdf.ln(5)
-    for title, content in [("SUMMARY", result["summary"]), ("KEY INFORMATION", result["key_info"]), ("RISK ANALYSIS", result["risks"]), ("FULL REPORT", result["report"])]:
-        pdf.set_font("Helvetica", "B", 13); pdf.cell(0, 10, title, ln=True)
-        pdf.set_font("Helvetica", "", 10)
-        pdf.multi_cell(0, 6, content.encode("latin-1", "replace").decode("latin-1")); pdf.ln(4)
-    return pdf.output()
+    for title, content in [("SUMMARY", summary), ("KEY INFORMATION", key_info), ("RISK ANALYSIS", risks), ("FULL REPORT", report)]:
+        pdf.set_font(font, "B", 13); pdf.cell(0, 10, title, ln=True)
+        pdf.set_font(font, "", 10)
+        pdf.multi_cell(0, 6, _pdf_text(content)); pdf.ln(4)
+    return bytes(pdf.output())
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _improved_pdf_bytes(filename: str, doc_type: str, improvement_score: int,
+                        total_iterations: int, final_text: str) -> bytes:
+    pdf, font = _new_pdf()
+    pdf.set_font(font, "B", 16); pdf.cell(0, 10, "Improved Document", ln=True, align="C"); pdf.ln(3)
+    pdf.set_font(font, "", 10)
+    for label, val in [("Original file", filename), ("Document type", doc_type), ("Quality score", f"{improvement_score}/100"), ("Iterations", str(total_iterations))]:
+        pdf.cell(0, 7, f"{label}: {val}", ln=True)
+    pdf.ln(5); pdf.set_font(font, "B", 13); pdf.cell(0, 10, "IMPROVED CONTENT", ln=True)
+    pdf.set_font(font, "", 10)
+    pdf.multi_cell(0, 6, _pdf_text(final_text))
+    return bytes(pdf.output())
+
+def export_to_pdf(result):
+    return _report_pdf_bytes(result["filename"], result["language"], result["risk_score"],
+                             result["summary"], result["key_info"], result["risks"], result["report"])
 
 def export_improved_pdf(result):
-    pdf = FPDF(); pdf.add_page()
-    pdf.set_font("Helvetica", "B", 16); pdf.cell(0, 10, "Improved Document", ln=True, align="C"); pdf.ln(3)
-    pdf.set_font("Helvetica", "", 10)
-    for label, val in [("Original file", result["filename"]), ("Document type", result["doc_type"]), ("Quality score", f"{result['improvement_score']}/100"), ("Iterations", str(result["total_iterations"]))]:
-        pdf.cell(0, 7, f"{label}: {val}", ln=True)
-    pdf.ln(5); pdf.set_font("Helvetica", "B", 13); pdf.cell(0, 10, "IMPROVED CONTENT", ln=True)
-    pdf.set_font("Helvetica", "", 10)
-    pdf.multi_cell(0, 6, result["final_text"].encode("latin-1", "replace").decode("latin-1"))
-    return pdf.output()
+    return _improved_pdf_bytes(result["filename"], result["doc_type"], result["improvement_score"],
+                               result["total_iterations"], result["final_text"])
 
 def render_score_progression(history):
     parts = []
@@ -237,6 +391,84 @@ def render_diff_html(diff_text):
     return "\n".join(out)
 
 
+# ── Static Pipeline-tab HTML (no dynamic fields — built once at import) ──
+PIPELINE_HTML = """<div class="pipeline-diagram">
+      <div style="margin-bottom:8px;"><div style="background:#313244;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
+        📄 <strong>PDF Document</strong><br><small style="color:#6c7086;">User Upload</small>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:12px;display:inline-block;min-width:220px;">
+        ⚙️ <strong>Agent 1 — Document Processor</strong><br><small style="color:#6c7086;">Extract · Language detect · ChromaDB store</small>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="color:#fab387;margin:6px 0;"><strong>⚡ Async Parallel (asyncio.gather)</strong></div>
+      <div style="display:flex;justify-content:center;gap:14px;margin:8px 0;flex-wrap:wrap;">
+        <div style="background:#1e1e2e;border:2px solid #fab387;border-radius:8px;padding:12px;min-width:150px;">📝 <strong>Agent 2</strong><br>Summarizer</div>
+        <div style="background:#1e1e2e;border:2px solid #fab387;border-radius:8px;padding:12px;min-width:150px;">🔍 <strong>Agent 3</strong><br>Extractor</div>
+        <div style="background:#1e1e2e;border:2px solid #fab387;border-radius:8px;padding:12px;min-width:150px;">⚠️ <strong>Agent 4</strong><br>Risk Flagger</div>
+      </div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #a6e3a1;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
+        🎯 <strong>Risk Score Calculator</strong><br><small style="color:#6c7086;">Context-aware 0–100</small>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #a6e3a1;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
+        📊 <strong>Agent 5 — Report Generator</strong>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
+        💡 <strong>Agent 6 — Questions Generator</strong>
+      </div></div>
+    </div>"""
+
+IMPROVE_CYCLE_HTML = """<div class="cycle-diagram" style="text-align:center;">
+      <div style="margin-bottom:6px;"><div style="background:#313244;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
+        📄 <strong>Document</strong> <span style="color:#6c7086;font-size:0.8em;">(from session or fresh upload)</span>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="margin-bottom:6px;"><div style="background:#1e1e2e;border:2px solid #89dceb;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
+        🔎 <strong>Doc Type Detector</strong><br><small style="color:#6c7086;">Resume · Contract · Report · Certificate</small>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div class="cycle-loop-box">
+        <span class="cycle-loop-label">🔄 AGENTIC SELF-CORRECTION LOOP (max 3 iterations)</span>
+        <div style="margin:10px 0 6px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
+          🧐 <strong>Critique Agent</strong><br><small style="color:#6c7086;">Section · Problem · Severity · Fix instruction</small>
+        </div></div>
+        <div class="cycle-arrow-down">↓</div>
+        <div style="margin:6px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
+          ✍️ <strong>Improvement Agent</strong><br><small style="color:#6c7086;">Rewrites · Fixes Critical & Major issues</small>
+        </div></div>
+        <div class="cycle-arrow-down">↓</div>
+        <div style="margin:6px 0;"><div style="background:#1e1e2e;border:2px solid #f9e2af;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
+          ✅ <strong>Verifier Agent</strong><br><small style="color:#f9e2af;">Adversarial · temperature=0 · Independent LLM</small>
+        </div></div>
+        <div class="cycle-arrow-down">↓</div>
+        <div style="margin:8px 0;"><div style="background:#2a2a1e;border:2px solid #f9e2af;border-radius:8px;padding:10px 20px;display:inline-block;">
+          ◆ <strong style="color:#f9e2af;">Score ≥ 85?</strong>
+        </div></div>
+        <div style="display:flex;justify-content:center;gap:60px;margin:6px 0;">
+          <div style="text-align:center;"><div style="color:#f38ba8;font-weight:bold;">❌ NO</div><div style="color:#6c7086;font-size:0.75em;">iteration &lt; 3</div></div>
+          <div style="text-align:center;"><div style="color:#a6e3a1;font-weight:bold;">✅ YES</div><div style="color:#6c7086;font-size:0.75em;">or iteration = 3</div></div>
+        </div>
+        <div style="display:flex;justify-content:center;gap:60px;margin:4px 0;">
+          <div style="text-align:center;color:#cba6f7;font-size:1.4em;">↑<br><span style="font-size:0.6em;color:#6c7086;">loops to Critique</span></div>
+          <div style="color:#a6e3a1;font-size:1.4em;">↓</div>
+        </div>
+      </div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #a6e3a1;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
+        🏁 <strong>Finalizer</strong><br><small style="color:#6c7086;">Picks best-scoring iteration</small>
+      </div></div>
+      <div class="cycle-arrow-down">↓</div>
+      <div style="display:flex;justify-content:center;gap:14px;flex-wrap:wrap;margin-top:8px;">
+        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">📝 Side-by-side</div>
+        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">🔀 Track changes</div>
+        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">🔖 Checkpoint</div>
+        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">⬇️ PDF export</div>
+      </div>
+    </div>"""
+
 # ── Tabs ──────────────────────────────────────────────────────────────
 tab_analyze, tab_qa, tab_improve, tab_pipeline, tab_history, tab_stats = st.tabs([
     "🔍 Analyze", "💬 Q&A", "🔧 Improve", "🕸️ Pipeline", "📋 History", "📊 Dashboard"
@@ -245,49 +477,93 @@ tab_analyze, tab_qa, tab_improve, tab_pipeline, tab_history, tab_stats = st.tabs
 # ══════════════════════════════════════════════════════════════════════
 # TAB 1 — ANALYZE
 # ══════════════════════════════════════════════════════════════════════
-with tab_analyze:
+@st.fragment
+def _analyze_tab():
     col_upload, col_result = st.columns([1, 2])
     with col_upload:
         st.markdown("### 📤 Upload Document")
         uploaded_file = st.file_uploader("Upload a PDF document", type=["pdf"],
             help="Supports contracts, invoices, reports, agreements", key="analyze_uploader")
 
+        run_clicked = False
         if uploaded_file:
             st.success(f"✅ {uploaded_file.name} uploaded")
             st.markdown(f"**Size:** {uploaded_file.size / 1024:.1f} KB")
-
-            if st.button("🚀 Analyze Document", use_container_width=True):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    tmp.write(uploaded_file.read())
-                    tmp_path = tmp.name
-
-                agent_placeholder = st.empty()
-                for i in range(len(AGENTS)):
-                    with agent_placeholder.container(): render_agents(active_idx=i, done_up_to=i)
-                    time.sleep(0.3)
-
-                with st.spinner(""):
-                    result = process_document(tmp_path, uploaded_file.name)
-                    st.session_state.result       = result
-                    st.session_state.qa_history   = []
-                    st.session_state.last_raw_text = result.get("raw_text", "")
-                    st.session_state.improve_file  = tmp_path  # not unlinked — kept for improve tab
-
-                with agent_placeholder.container(): render_agents(done_up_to=len(AGENTS))
-                st.rerun()
+            run_clicked = st.button("🚀 Analyze Document", use_container_width=True)
 
         st.markdown("---")
         st.markdown("### 🤖 Agent Pipeline")
-        render_agents()
+        # Single placeholder for the pipeline cards: idle list normally,
+        # animated progression while an analysis runs — never both.
+        agent_placeholder = st.empty()
+
+        if run_clicked:
+            pdf_bytes = uploaded_file.getvalue()
+
+            # Run the pipeline in a worker thread and advance the agent
+            # cards while it works — the animation overlaps the real LLM
+            # latency instead of adding to it.
+            ctx = get_script_run_ctx()
+            def _run_analysis():
+                add_script_run_ctx(threading.current_thread(), ctx)
+                return _analyze_cached(pdf_bytes, uploaded_file.name)
+
+            with st.spinner(""):
+                with ThreadPoolExecutor(max_workers=1) as ex:
+                    fut  = ex.submit(_run_analysis)
+                    step = 0
+                    while not fut.done():
+                        active = min(step, len(AGENTS) - 1)
+                        with agent_placeholder.container():
+                            render_agents(active_idx=active, done_up_to=active)
+                        time.sleep(0.3)
+                        step += 1
+                    result = fut.result()
+                # Failures come back as status "failed" dicts rather than
+                # exceptions; evict the entry so a re-click retries
+                # instead of replaying a memoized outage. Mirrors how
+                # analyze_document only persists COMPLETE results.
+                if result.get("status") != "complete":
+                    _analyze_cached.clear(pdf_bytes, uploaded_file.name)
+                # Keep the bulky extracted text out of the session copy of
+                # the result and hold it zlib-compressed — it's only needed
+                # again if the Improve loop reuses this analysis.
+                raw_text = result.get("raw_text", "")
+                st.session_state.result       = {k: v for k, v in result.items() if k != "raw_text"}
+                st.session_state.qa_history   = []
+                st.session_state.last_raw_text = zlib.compress(raw_text.encode()) if raw_text else None
+                st.session_state.improve_file_bytes = pdf_bytes  # kept for improve tab
+
+                # Pre-answer the suggested questions in the background:
+                # the bulk path writes each answer into the per-document
+                # response cache, so by the time one is clicked in the
+                # Q&A tab the ask is served locally.
+                questions = result.get("suggested_questions") or []
+                if result.get("status") == "complete" and questions:
+                    threading.Thread(
+                        target=_backend().ask_documents_bulk,
+                        args=(questions, result["filename"], result.get("language", "English")),
+                        daemon=True,
+                    ).start()
+
+            with agent_placeholder.container(): render_agents(done_up_to=len(AGENTS))
+            st.session_state.history_version = st.session_state.get("history_version", 0) + 1
+            st.rerun()
+        else:
+            agent_placeholder.markdown(_AGENT_PIPELINE_IDLE_HTML, unsafe_allow_html=True)
 
     with col_result:
         if st.session_state.result:
             result = st.session_state.result
-            status = result["status"]
+            # Unpack once — the f-strings below hit these locals instead of
+            # re-doing dict lookups on every rerun.
+            filename = result["filename"]
+            status   = result["status"]
+            language = result.get("language", "English")
             col_title, col_score = st.columns([2, 1])
             with col_title:
-                st.markdown(f"### 📄 {result['filename']}")
-                st.markdown(f"🌐 **Language:** {result.get('language','English')}")
+                st.markdown(f"### 📄 {filename}")
+                st.markdown(f"🌐 **Language:** {language}")
                 if status == "complete":
                     st.markdown('<span class="status-complete">✅ Analysis Complete</span>', unsafe_allow_html=True)
                     st.markdown('💡 <small style="color:#6c7086;">Go to <strong>🔧 Improve</strong> to run the self-correcting loop.</small>', unsafe_allow_html=True)
@@ -305,31 +581,33 @@ with tab_analyze:
                     </div>""", unsafe_allow_html=True)
 
             if status == "complete":
+                summary, key_info, risks_text, report = (
+                    result["summary"], result["key_info"], result["risks"], result["report"])
                 r1, r2, r3, r4 = st.tabs(["📋 Full Report", "📝 Summary", "🔍 Key Info", "⚠️ Risks"])
                 with r1:
-                    st.markdown(f'<div class="report-section">{result["report"]}</div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="report-section">{report}</div>', unsafe_allow_html=True)
                     c1, c2 = st.columns(2)
-                    with c1: st.download_button("⬇️ TXT", result["report"], f"{result['filename']}_report.txt", "text/plain")
-                    with c2: st.download_button("⬇️ PDF", bytes(export_to_pdf(result)), f"{result['filename']}_report.pdf", "application/pdf")
-                with r2: st.markdown(f'<div class="report-section">{result["summary"]}</div>', unsafe_allow_html=True)
-                with r3: st.markdown(f'<div class="report-section">{result["key_info"]}</div>', unsafe_allow_html=True)
+                    with c1: st.download_button("⬇️ TXT", report, f"{filename}_report.txt", "text/plain")
+                    with c2: st.download_button("⬇️ PDF", export_to_pdf(result), f"{filename}_report.pdf", "application/pdf")
+                with r2: st.markdown(f'<div class="report-section">{summary}</div>', unsafe_allow_html=True)
+                with r3: st.markdown(f'<div class="report-section">{key_info}</div>', unsafe_allow_html=True)
                 with r4:
-                    risks_text = result["risks"]
-                    for key, (css, label) in {"HIGH RISK": ("risk-high","🔴 High Risk"), "MEDIUM RISK": ("risk-medium","🟡 Medium Risk"), "LOW RISK": ("risk-low","🟢 Low Risk")}.items():
-                        if key in risks_text:
-                            start = risks_text.find(key) + len(key)
-                            next_keys = [k for k in ["HIGH RISK","MEDIUM RISK","LOW RISK"] if k != key and k in risks_text[start:]]
-                            end = risks_text.find(next_keys[0], start) if next_keys else len(risks_text)
-                            st.markdown(f'<div class="agent-card {css}"><strong>{label}</strong><br><br>{risks_text[start:end].strip()}</div>', unsafe_allow_html=True)
+                    for css, label, content in _split_risks(risks_text):
+                        st.markdown(f'<div class="agent-card {css}"><strong>{label}</strong><br><br>{content}</div>', unsafe_allow_html=True)
                     st.markdown("---")
                     st.markdown(f'<div class="report-section">{risks_text}</div>', unsafe_allow_html=True)
         else:
             st.markdown('<div class="agent-card" style="text-align:center;padding:60px;"><h3>📤 Upload a PDF to get started</h3><p style="color:#6c7086;">Supports contracts, invoices, agreements, reports</p></div>', unsafe_allow_html=True)
 
+with tab_analyze:
+    _analyze_tab()
+
+
 # ══════════════════════════════════════════════════════════════════════
 # TAB 2 — Q&A
 # ══════════════════════════════════════════════════════════════════════
-with tab_qa:
+@st.fragment
+def _qa_tab():
     st.markdown("### 💬 Ask Questions About Your Document")
     if not st.session_state.result:
         st.info("📄 Analyze a document first to enable Q&A mode.")
@@ -339,33 +617,43 @@ with tab_qa:
         st.markdown(f"**Document:** `{result['filename']}` | **Language:** {language}")
         st.divider()
 
-        for msg in st.session_state.qa_history:
-            css = "qa-message-user" if msg["role"] == "user" else "qa-message-ai"
-            icon = "👤" if msg["role"] == "user" else "🤖"
-            st.markdown(f'<div class="{css}">{icon} {msg["content"]}</div>', unsafe_allow_html=True)
+        # Placeholder filled after the button handlers below have run, so
+        # new messages show up in the same run — no forced st.rerun()
+        # (which restarted the whole script once per question).
+        messages_area = st.container()
 
         suggestions = result.get("suggested_questions", [])
         if suggestions:
             st.markdown("**💡 Suggested questions:**")
-            col1, col2 = st.columns(2)
-            for i, s in enumerate(suggestions):
-                with (col1 if i % 2 == 0 else col2):
-                    if st.button(s, key=f"sug_{i}", use_container_width=True):
-                        with st.spinner("🤖 Searching..."): answer = ask_document(s, result["filename"], language)
-                        st.session_state.qa_history += [{"role":"user","content":s},{"role":"assistant","content":answer}]
-                        st.rerun()
+            # One form + radio instead of N buttons: a single rerun on
+            # submit rather than a potential rerun per button widget.
+            with st.form("sugg_form", border=False):
+                choice    = st.radio("Suggested questions", suggestions, index=None, label_visibility="collapsed")
+                submitted = st.form_submit_button("📨 Ask Suggested", use_container_width=True)
+            if submitted and choice:
+                with st.spinner("🤖 Searching..."): answer = _ask(choice, result["filename"], language)
+                st.session_state.qa_history += [{"role":"user","content":choice},{"role":"assistant","content":answer}]
 
         st.divider()
-        question = st.text_input("Ask your own question:", placeholder="e.g. What are the termination conditions?", key="qa_input")
-        c1, c2 = st.columns([3, 1])
-        with c1:
-            if st.button("📨 Ask", use_container_width=True) and question:
-                with st.spinner("🤖 Searching..."): answer = ask_document(question, result["filename"], language)
-                st.session_state.qa_history += [{"role":"user","content":question},{"role":"assistant","content":answer}]
-                st.rerun()
-        with c2:
-            if st.button("🗑️ Clear", use_container_width=True):
-                st.session_state.qa_history = []; st.rerun()
+        question = st.chat_input("e.g. What are the termination conditions?")
+        if question:
+            with st.spinner("🤖 Searching..."): answer = _ask(question, result["filename"], language)
+            st.session_state.qa_history += [{"role":"user","content":question},{"role":"assistant","content":answer}]
+        if st.button("🗑️ Clear", use_container_width=True):
+            st.session_state.qa_history = []
+
+        # Native chat widgets: each message is its own element, so
+        # Streamlit diffs the transcript instead of re-shipping one big
+        # HTML blob whenever a message is added.
+        with messages_area:
+            for msg in st.session_state.qa_history:
+                avatar = "👤" if msg["role"] == "user" else "🤖"
+                with st.chat_message(msg["role"], avatar=avatar):
+                    st.markdown(msg["content"])
+
+with tab_qa:
+    _qa_tab()
+
 
 # ══════════════════════════════════════════════════════════════════════
 # TAB 3 — IMPROVE
@@ -409,7 +697,7 @@ with tab_improve:
             if st.button("⏭️ Resume Last Run", use_container_width=True):
                 with st.spinner("⏭️ Resuming from checkpoint..."):
                     try:
-                        improve_res = resume_improvement(tid)
+                        improve_res = _agents().resume_improvement(tid)
                         st.session_state.improve_result = improve_res
                         st.rerun()
                     except Exception as e:
@@ -431,15 +719,24 @@ with tab_improve:
         if can_run:
             if st.button("🚀 Start Improvement Loop", use_container_width=True, type="primary"):
                 if improve_upload:
+                    # Stream to disk in 1 MiB chunks — avoids holding the whole
+                    # PDF in memory just to copy it out again.
                     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                        tmp.write(improve_upload.read())
+                        shutil.copyfileobj(improve_upload, tmp, length=1024 * 1024)
                         imp_path = tmp.name
                     existing_analysis = None
                 else:
-                    imp_path          = st.session_state.improve_file or ""
+                    if st.session_state.improve_file_bytes:
+                        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                            tmp.write(st.session_state.improve_file_bytes)
+                            imp_path = tmp.name
+                    else:
+                        imp_path = ""
                     existing_analysis = st.session_state.result
                     if existing_analysis and not existing_analysis.get("raw_text"):
-                        existing_analysis = {**existing_analysis, "raw_text": st.session_state.last_raw_text or ""}
+                        blob = st.session_state.last_raw_text
+                        existing_analysis = {**existing_analysis,
+                                             "raw_text": zlib.decompress(blob).decode() if blob else ""}
 
                 imp_placeholder = st.empty()
                 for i in range(len(IMPROVE_AGENTS)):
@@ -448,14 +745,23 @@ with tab_improve:
                         if i >= 1: st.markdown('<div class="loop-indicator">🔄 Self-correcting loop in progress...</div>', unsafe_allow_html=True)
                     time.sleep(0.4)
 
-                with st.spinner("🧠 Running improvement loop (30–60s)..."):
-                    improve_res = improve_document(
-                        file_path=imp_path,
-                        existing_analysis=existing_analysis
-                    )
-                    st.session_state.improve_result   = improve_res
-                    # CHECKPOINTING: store thread_id for potential resume
-                    st.session_state.improve_thread_id = improve_res.get("thread_id")
+                try:
+                    with st.spinner("🧠 Running improvement loop (30–60s)..."):
+                        improve_res = _agents().improve_document(
+                            file_path=imp_path,
+                            existing_analysis=existing_analysis
+                        )
+                        st.session_state.improve_result   = improve_res
+                        # CHECKPOINTING: store thread_id for potential resume
+                        st.session_state.improve_thread_id = improve_res.get("thread_id")
+                finally:
+                    # The temp PDF is only needed for this run — always remove
+                    # it, even when the improvement loop raises.
+                    if imp_path and os.path.exists(imp_path):
+                        try:
+                            os.unlink(imp_path)
+                        except OSError:
+                            pass
 
                 with imp_placeholder.container(): render_improve_agents(done_up_to=len(IMPROVE_AGENTS))
                 st.rerun()
@@ -543,7 +849,7 @@ with tab_improve:
                     st.markdown("#### ⬇️ Download")
                     ce1, ce2 = st.columns(2)
                     with ce1: st.download_button("⬇️ TXT", imp.get("final_text",""), f"{imp['filename']}_improved.txt", "text/plain", use_container_width=True)
-                    with ce2: st.download_button("⬇️ PDF", bytes(export_improved_pdf(imp)), f"{imp['filename']}_improved.pdf", "application/pdf", use_container_width=True)
+                    with ce2: st.download_button("⬇️ PDF", export_improved_pdf(imp), f"{imp['filename']}_improved.pdf", "application/pdf", use_container_width=True)
                     st.markdown("---")
                     st.markdown(f'<div class="report-section" style="white-space:pre-wrap;">{imp.get("final_text","")}</div>', unsafe_allow_html=True)
         else:
@@ -563,84 +869,11 @@ with tab_improve:
 # ══════════════════════════════════════════════════════════════════════
 with tab_pipeline:
     st.markdown("### 🕸️ Multi-Agent Pipeline Architecture")
-    st.markdown("""<div class="pipeline-diagram">
-      <div style="margin-bottom:8px;"><div style="background:#313244;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
-        📄 <strong>PDF Document</strong><br><small style="color:#6c7086;">User Upload</small>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:12px;display:inline-block;min-width:220px;">
-        ⚙️ <strong>Agent 1 — Document Processor</strong><br><small style="color:#6c7086;">Extract · Language detect · ChromaDB store</small>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="color:#fab387;margin:6px 0;"><strong>⚡ Async Parallel (asyncio.gather)</strong></div>
-      <div style="display:flex;justify-content:center;gap:14px;margin:8px 0;flex-wrap:wrap;">
-        <div style="background:#1e1e2e;border:2px solid #fab387;border-radius:8px;padding:12px;min-width:150px;">📝 <strong>Agent 2</strong><br>Summarizer</div>
-        <div style="background:#1e1e2e;border:2px solid #fab387;border-radius:8px;padding:12px;min-width:150px;">🔍 <strong>Agent 3</strong><br>Extractor</div>
-        <div style="background:#1e1e2e;border:2px solid #fab387;border-radius:8px;padding:12px;min-width:150px;">⚠️ <strong>Agent 4</strong><br>Risk Flagger</div>
-      </div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #a6e3a1;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
-        🎯 <strong>Risk Score Calculator</strong><br><small style="color:#6c7086;">Context-aware 0–100</small>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #a6e3a1;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
-        📊 <strong>Agent 5 — Report Generator</strong>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:12px;display:inline-block;min-width:200px;">
-        💡 <strong>Agent 6 — Questions Generator</strong>
-      </div></div>
-    </div>""", unsafe_allow_html=True)
+    st.markdown(PIPELINE_HTML, unsafe_allow_html=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown("### 🔧 Improvement Loop — Agentic Cycle")
-    st.markdown("""<div class="cycle-diagram" style="text-align:center;">
-      <div style="margin-bottom:6px;"><div style="background:#313244;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
-        📄 <strong>Document</strong> <span style="color:#6c7086;font-size:0.8em;">(from session or fresh upload)</span>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="margin-bottom:6px;"><div style="background:#1e1e2e;border:2px solid #89dceb;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
-        🔎 <strong>Doc Type Detector</strong><br><small style="color:#6c7086;">Resume · Contract · Report · Certificate</small>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div class="cycle-loop-box">
-        <span class="cycle-loop-label">🔄 AGENTIC SELF-CORRECTION LOOP (max 3 iterations)</span>
-        <div style="margin:10px 0 6px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
-          🧐 <strong>Critique Agent</strong><br><small style="color:#6c7086;">Section · Problem · Severity · Fix instruction</small>
-        </div></div>
-        <div class="cycle-arrow-down">↓</div>
-        <div style="margin:6px 0;"><div style="background:#1e1e2e;border:2px solid #cba6f7;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
-          ✍️ <strong>Improvement Agent</strong><br><small style="color:#6c7086;">Rewrites · Fixes Critical & Major issues</small>
-        </div></div>
-        <div class="cycle-arrow-down">↓</div>
-        <div style="margin:6px 0;"><div style="background:#1e1e2e;border:2px solid #f9e2af;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
-          ✅ <strong>Verifier Agent</strong><br><small style="color:#f9e2af;">Adversarial · temperature=0 · Independent LLM</small>
-        </div></div>
-        <div class="cycle-arrow-down">↓</div>
-        <div style="margin:8px 0;"><div style="background:#2a2a1e;border:2px solid #f9e2af;border-radius:8px;padding:10px 20px;display:inline-block;">
-          ◆ <strong style="color:#f9e2af;">Score ≥ 85?</strong>
-        </div></div>
-        <div style="display:flex;justify-content:center;gap:60px;margin:6px 0;">
-          <div style="text-align:center;"><div style="color:#f38ba8;font-weight:bold;">❌ NO</div><div style="color:#6c7086;font-size:0.75em;">iteration &lt; 3</div></div>
-          <div style="text-align:center;"><div style="color:#a6e3a1;font-weight:bold;">✅ YES</div><div style="color:#6c7086;font-size:0.75em;">or iteration = 3</div></div>
-        </div>
-        <div style="display:flex;justify-content:center;gap:60px;margin:4px 0;">
-          <div style="text-align:center;color:#cba6f7;font-size:1.4em;">↑<br><span style="font-size:0.6em;color:#6c7086;">loops to Critique</span></div>
-          <div style="color:#a6e3a1;font-size:1.4em;">↓</div>
-        </div>
-      </div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="margin:8px 0;"><div style="background:#1e1e2e;border:2px solid #a6e3a1;border-radius:8px;padding:10px;display:inline-block;min-width:200px;">
-        🏁 <strong>Finalizer</strong><br><small style="color:#6c7086;">Picks best-scoring iteration</small>
-      </div></div>
-      <div class="cycle-arrow-down">↓</div>
-      <div style="display:flex;justify-content:center;gap:14px;flex-wrap:wrap;margin-top:8px;">
-        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">📝 Side-by-side</div>
-        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">🔀 Track changes</div>
-        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">🔖 Checkpoint</div>
-        <div style="background:#313244;border-radius:8px;padding:10px;min-width:120px;">⬇️ PDF export</div>
-      </div>
-    </div>""", unsafe_allow_html=True)
+    st.markdown(IMPROVE_CYCLE_HTML, unsafe_allow_html=True)
 
     st.markdown("---")
     st.markdown("### 🛠️ Tech Stack")
@@ -651,34 +884,68 @@ with tab_pipeline:
 # ══════════════════════════════════════════════════════════════════════
 # TAB 5 — HISTORY
 # ══════════════════════════════════════════════════════════════════════
-with tab_history:
+_HISTORY_PAGE_SIZE = 10
+
+@st.fragment
+def _history_tab():
     st.markdown("### 📋 Analysis History")
-    history = get_history()
+    history = _cached_history(st.session_state.get("history_version", 0))
     if history:
-        for entry in history:
+        # Paginate so the rerun payload stays O(page) instead of growing
+        # with every analysis ever logged.
+        page_count = (len(history) + _HISTORY_PAGE_SIZE - 1) // _HISTORY_PAGE_SIZE
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key="hist_page")
+        start = (page - 1) * _HISTORY_PAGE_SIZE
+        # Bind the hot st calls to locals so the per-entry loop skips the
+        # repeated attribute lookups.
+        _expander, _md, _dl, _btn = st.expander, st.markdown, st.download_button, st.button
+        for entry in history[start:start + _HISTORY_PAGE_SIZE]:
+            entry_id, filename, status, summary, report = (
+                entry["id"], entry["filename"], entry["status"], entry["summary"], entry["report"])
             score = entry.get("risk_score", 0); css, label = get_risk_color(score)
-            with st.expander(f"📄 {entry['filename']} — {entry['timestamp']} — {score}/100"):
-                c1, c2 = st.columns(2)
-                with c1:
-                    sc = "status-complete" if entry["status"] == "complete" else "status-failed"
-                    st.markdown(f'<span class="{sc}">{entry["status"].upper()}</span>', unsafe_allow_html=True)
-                with c2: st.markdown(f"🌐 **Language:** {entry.get('language','English')}")
-                if entry["summary"]: st.markdown(f'<div class="report-section">{entry["summary"]}</div>', unsafe_allow_html=True)
-                if entry["report"]: st.download_button("⬇️ Download", entry["report"], f"{entry['filename']}_report.txt", "text/plain", key=f"dl_{entry['id']}")
+            with _expander(f"📄 {filename} — {entry['timestamp']} — {score}/100"):
+                # One markdown delta per entry instead of three — fewer
+                # ForwardMsgs when history grows long.
+                sc   = "status-complete" if status == "complete" else "status-failed"
+                html = (f'<span class="{sc}">{status.upper()}</span>'
+                        f' &nbsp;·&nbsp; 🌐 <strong>Language:</strong> {entry.get("language", "English")}')
+                if summary:
+                    html += f'<div class="report-section" style="margin-top:8px;">{summary}</div>'
+                _md(html, unsafe_allow_html=True)
+                if report:
+                    # Only serialize the report into the page payload once the
+                    # user asks for it — keeps rerun payload O(1) per entry
+                    # instead of shipping every report on every rerun.
+                    if st.session_state.get("_dl_ready") == entry_id:
+                        _dl("⬇️ Download", report, f"{filename}_report.txt", "text/plain", key=f"dl_{entry_id}")
+                    elif _btn("⬇️ Prepare download", key=f"prep_{entry_id}"):
+                        st.session_state["_dl_ready"] = entry_id
+                        st.rerun(scope="fragment")
     else:
         st.info("💡 No analyses yet.")
 
+with tab_history:
+    _history_tab()
+
+
 # ══════════════════════════════════════════════════════════════════════
 # TAB 6 — DASHBOARD
 # ══════════════════════════════════════════════════════════════════════
-with tab_stats:
+@st.fragment
+def _stats_tab():
     st.markdown("### 📊 Dashboard")
-    stats = get_dashboard_stats()
+    stats = _cached_stats(st.session_state.get("history_version", 0))
     cols  = st.columns(4)
     for col, icon, val, label in zip(cols, ["📄","✅","❌","🎯"], [stats["total"],stats["successful"],stats["failed"],stats["avg_risk"]], ["Total Analyses","Successful","Failed","Avg Risk Score"]):
         with col: st.markdown(f'<div class="metric-card">{icon}<b>{val}</b>{label}</div>', unsafe_allow_html=True)
     if stats["recent"]:
         st.markdown("### 🕓 Recently Analyzed")
+        _md = st.markdown
         for item in stats["recent"]:
             score = item.get("risk_score", 0); css, label = get_risk_color(score)
-            st.markdown(f'<div class="agent-card" style="display:flex;justify-content:space-between;align-items:center;"><span>📄 <strong>{item["filename"]}</strong> — {item["timestamp"]}</span><span class="{css}" style="font-size:1em;">{score}/100 {label}</span></div>', unsafe_allow_html=True)
\ No newline at end of file
+            _md(f'<div class="agent-card" style="display:flex;justify-content:space-between;align-items:center;"><span>📄 <strong>{item["filename"]}</strong> — {item["timestamp"]}</span><span class="{css}" style="font-size:1em;">{score}/100 {label}</span></div>', unsafe_allow_html=True)
+
+with tab_stats:
+    _stats_tab()
@@ -1,14 +1,20 @@
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
+import atexit
 import json
+import logging
+import queue
+import random
 import re
 import time
 import uuid
 import asyncio
 import difflib
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from enum import Enum
 from typing import TypedDict
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
@@ -20,12 +26,63 @@ from src.tools import (
     summarize_text,
     extract_key_info,
     flag_risks,
+    analyze_document_combined,
     generate_report,
-    search_document
+    search_document,
+    search_documents_batch,
+    shared_http_clients,
+    warmup as _tools_warmup
 )
+from src import agents_cache
+from src import llm_cache
 
 load_dotenv()
 
+# ── Logging ───────────────────────────────────────────────────────────
+# Agents log from worker threads; a QueueHandler makes emission a cheap
+# enqueue and a single background QueueListener does the blocking stream
+# write, so the parallel fan-out threads never contend on stdout.
+log = logging.getLogger("agents")
+if not log.handlers:
+    _log_queue = queue.Queue(-1)
+    log.addHandler(QueueHandler(_log_queue))
+    _log_listener = QueueListener(_log_queue, logging.StreamHandler())
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    log.setLevel(logging.INFO)
+
+# Warm the embedding model and Chroma index off the critical path, so
+# the first store_document call of a session doesn't pay the cold-start.
+threading.Thread(target=_tools_warmup, daemon=True).start()
+
+# One process-wide pool for the thread-based fan-outs, instead of paying
+# thread creation/teardown on every pipeline run.
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agents")
+atexit.register(_EXECUTOR.shutdown)
+
+# All async LLM work runs on one long-lived loop thread. Per-call
+# asyncio.run() loops would leave the shared httpx.AsyncClient's
+# keep-alive connections bound to a closed loop, so the next async call
+# in the same process would fail trying to reuse them.
+_ASYNC_LOOP      = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+
+def _get_async_loop():
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            _ASYNC_LOOP = loop
+    return _ASYNC_LOOP
+
+
+def _run_async(coro):
+    """Run coro on the shared loop thread and block for its result.
+    Safe to call from any thread, including ones already inside a loop."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_async_loop()).result()
+
 # ── Checkpointing DB path ─────────────────────────────────────────────
 # Kept separate from interactions.db (app data) intentionally.
 # This is LangGraph infrastructure state — different lifecycle.
@@ -34,26 +91,84 @@ os.makedirs("logs", exist_ok=True)
 
 
 # ── LLM instances ─────────────────────────────────────────────────────
-llm = ChatGroq(
-    model=os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile"),
-    api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.3
-)
+# Resolved once — every client construction and cache key reads this.
+CHAT_MODEL = os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile")
+
+# Constructed on first use rather than at import — CLI help paths and
+# cold imports skip building Groq clients they never call.
+@lru_cache(maxsize=None)
+def _get_llm():
+    http_client, http_async_client = shared_http_clients()
+    return ChatGroq(
+        model=CHAT_MODEL,
+        api_key=os.getenv("GROQ_API_KEY"),
+        temperature=0.3,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
 
 # VERIFIER FIX: separate LLM instance with temperature=0 (deterministic)
 # and an adversarial system prompt so it grades independently of the
 # improvement agent rather than rubber-stamping its own outputs.
-verifier_llm = ChatGroq(
-    model=os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile"),
-    api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.0
-)
+@lru_cache(maxsize=None)
+def _get_verifier_llm():
+    http_client, http_async_client = shared_http_clients()
+    return ChatGroq(
+        model=CHAT_MODEL,
+        api_key=os.getenv("GROQ_API_KEY"),
+        temperature=0.0,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
 VERIFIER_SYSTEM_PROMPT = """You are a harsh, skeptical document quality assessor.
 Your job is to find what is STILL WRONG with a document after it has been edited.
 Do NOT give credit for cosmetic changes. Do NOT be generous.
 Score conservatively — if in doubt, score lower.
 A score of 85+ means the document is genuinely publication-ready with no meaningful issues."""
 
+# ── Prompt templates ──────────────────────────────────────────────────
+# Built once at import; call sites fill in the per-call fields via the
+# bound .format. Keeping the static text identical across calls also
+# gives prompt-prefix caches a stable key.
+_DETECT_LANGUAGE_TMPL = (
+    "Detect the language of this text.\n"
+    "Return ONLY the language name in English.\n\n"
+    "Text: {text}\n\nLanguage:"
+).format
+
+_REPORT_TMPL = """Create a professional document analysis report.
+
+SUMMARY:
+{summary}
+KEY INFORMATION:
+{key_info}
+RISK ANALYSIS:
+{risks}
+RISK SCORE: {risk_score}/100
+
+Document: {filename}{lang_note}
+
+Report:""".format
+
+_QUESTIONS_TMPL = """Generate exactly 5 specific questions a user might ask about this document. {lang_note}
+Return ONLY a JSON object of the form {{"questions": ["...", "...", "...", "...", "..."]}}.
+
+Document:
+{text}
+
+Questions JSON:""".format
+
+_ANSWER_TMPL = """You are a document analysis assistant.
+Answer based ONLY on the document content. Be specific and direct. {lang_note}
+
+Document: {filename}
+Question: {question}
+
+Relevant sections:
+{context}
+
+Answer:""".format
+
 
 # ══════════════════════════════════════════════════════════════════════
 # RETRY WITH BACKOFF
@@ -68,8 +183,10 @@ def retry_with_backoff(fn, *args, max_retries: int = 3, base_delay: float = 2.0,
             last_error = e
             err_str = str(e).lower()
             if "429" in err_str or "rate limit" in err_str or "502" in err_str or "503" in err_str:
-                delay = base_delay * (2 ** attempt)
-                print(f"[Retry] Attempt {attempt + 1}/{max_retries} — retrying in {delay}s...")
+                # Jitter de-synchronizes concurrent retries so the fan-out
+                # threads don't hammer the API in lockstep.
+                delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+                log.info(f"[Retry] Attempt {attempt + 1}/{max_retries} — retrying in {delay:.1f}s...")
                 time.sleep(delay)
             else:
                 raise
@@ -86,17 +203,65 @@ async def async_retry_with_backoff(fn, *args, max_retries: int = 3, base_delay:
             last_error = e
             err_str = str(e).lower()
             if "429" in err_str or "rate limit" in err_str or "502" in err_str or "503" in err_str:
-                delay = base_delay * (2 ** attempt)
-                print(f"[Async Retry] Attempt {attempt + 1}/{max_retries} — retrying in {delay}s...")
+                delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+                log.info(f"[Async Retry] Attempt {attempt + 1}/{max_retries} — retrying in {delay:.1f}s...")
                 await asyncio.sleep(delay)
             else:
                 raise
     raise last_error
 
 
+# ══════════════════════════════════════════════════════════════════════
+# JSON EXTRACTION FROM LLM OUTPUT
+# ══════════════════════════════════════════════════════════════════════
+def _extract_json(content: str, opener: str = "{", closer: str = "}"):
+    """Parse the first complete JSON value in content, or return None.
+
+    Tries the whole stripped string first (the common pure-JSON case),
+    then walks from the first opener tracking brace depth. Unlike the
+    old non-greedy \\{.*?\\} regex, nested braces can't truncate the
+    match and there is no backtracking — one linear pass.
+    """
+    content = content.strip()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    start = content.find(opener)
+    if start == -1:
+        return None
+    depth     = 0
+    in_string = escaped = False
+    for i in range(start, len(content)):
+        ch = content[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == opener:
+            depth += 1
+        elif ch == closer:
+            depth -= 1
+            if depth == 0:
+                try:
+                    return json.loads(content[start:i + 1])
+                except json.JSONDecodeError:
+                    return None
+    return None
+
+
 # ══════════════════════════════════════════════════════════════════════
 # SMART CHUNKING FOR LONG DOCUMENTS
 # ══════════════════════════════════════════════════════════════════════
+# Compiled once — the keyword scan runs per chunk on every long document.
+_WORD_RE = re.compile(r'\b\w{4,}\b')
+
+
 def extract_relevant_chunks(text: str, focus_hint: str = "", max_chars: int = 4000) -> str:
     """
     Short docs (<= max_chars): return as-is.
@@ -119,10 +284,10 @@ def extract_relevant_chunks(text: str, focus_hint: str = "", max_chars: int = 40
         tail     = chunks[-1] if len(chunks) > 1 else ""
         return (head + "\n\n[...]\n\n" + tail)[:max_chars]
 
-    hint_words = set(re.findall(r'\b\w{4,}\b', focus_hint.lower()))
+    hint_words = set(_WORD_RE.findall(focus_hint.lower()))
     scored     = []
     for i, chunk in enumerate(chunks):
-        chunk_words   = set(re.findall(r'\b\w{4,}\b', chunk.lower()))
+        chunk_words   = set(_WORD_RE.findall(chunk.lower()))
         overlap_score = len(hint_words & chunk_words)
         scored.append((overlap_score, i, chunk))
 
@@ -137,13 +302,30 @@ def extract_relevant_chunks(text: str, focus_hint: str = "", max_chars: int = 40
     return "\n\n[...]\n\n".join(selected)
 
 
+
 # ══════════════════════════════════════════════════════════════════════
 # ANALYSIS PIPELINE — STATE
 # ══════════════════════════════════════════════════════════════════════
+class Status(str, Enum):
+    """Analysis pipeline status. The str base keeps DB rows, JSON output
+    and the Streamlit/API comparisons on plain strings working unchanged."""
+    # On 3.11+ the enum's __str__/__format__ would otherwise render as
+    # "Status.COMPLETE" in f-strings (CLI output, log lines).
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+    STARTING  = "starting"
+    PROCESSED = "processed"
+    ANALYZED  = "analyzed"
+    COMPLETE  = "complete"
+    FAILED    = "failed"
+
+
 class DocumentState(TypedDict):
     file_path:           str
     filename:            str
     raw_text:            str
+    analysis_text:       str   # truncated view the analyzer prompts actually consume
     summary:             str
     key_info:            str
     risks:               str
@@ -159,57 +341,126 @@ class DocumentState(TypedDict):
 # ══════════════════════════════════════════════════════════════════════
 # ANALYSIS PIPELINE — SYNC AGENTS
 # ══════════════════════════════════════════════════════════════════════
+# Prompts downstream expect English language names, not ISO codes.
+_LANG_CODE_NAMES = {
+    "en": "English",  "fr": "French",     "es": "Spanish",  "de": "German",
+    "it": "Italian",  "pt": "Portuguese", "nl": "Dutch",    "ar": "Arabic",
+    "ru": "Russian",  "zh-cn": "Chinese", "zh-tw": "Chinese",
+    "ja": "Japanese", "ko": "Korean",     "tr": "Turkish",  "pl": "Polish",
+    "hi": "Hindi",
+}
+
+
 def detect_language(text: str) -> str:
+    # In-process detection first — langdetect answers in sub-millisecond
+    # where the LLM round-trip costs hundreds of ms, and
+    # document_processor blocks on this before analysis can start.
     try:
-        prompt   = f"Detect the language of this text.\nReturn ONLY the language name in English.\n\nText: {text[:500]}\n\nLanguage:"
-        response = retry_with_backoff(llm.invoke, prompt)
-        return response.content.strip()
+        from langdetect import detect, DetectorFactory
+        DetectorFactory.seed = 0  # deterministic across runs
+        name = _LANG_CODE_NAMES.get(detect(text[:2000]))
+        if name:
+            return name
+    except Exception:
+        pass  # not installed, or detection failed — ask the LLM below
+    try:
+        # The LLM only sees the first 500 chars, which makes the prefix a
+        # complete cache key — identical documents skip the round-trip.
+        cache_key = agents_cache.make_text_key("lang", text[:500])
+        cached    = agents_cache.get_analysis(cache_key)
+        if cached:
+            return cached["value"]
+        prompt   = _DETECT_LANGUAGE_TMPL(text=text[:500])
+        response = retry_with_backoff(_get_llm().invoke, prompt)
+        language = response.content.strip()
+        agents_cache.set_analysis(cache_key, {"value": language})
+        return language
     except Exception:
         return "English"
 
 
 def document_processor(state: DocumentState) -> DocumentState:
-    print(f"\n[Agent 1] Processing: {state['filename']}")
+    log.info(f"\n[Agent 1] Processing: {state['filename']}")
     try:
         raw_text = extract_text_from_pdf.invoke({"file_path": state["file_path"]})
         if raw_text.startswith("Error"):
-            return {**state, "error": raw_text, "status": "failed"}
+            return {"error": raw_text, "status": Status.FAILED}
 
         store_result = store_document.invoke({"file_path": state["file_path"], "content": raw_text})
-        print(f"[Agent 1] {store_result}")
+        log.info(f"[Agent 1] {store_result}")
 
         language = detect_language(raw_text)
-        return {**state, "raw_text": raw_text, "language": language, "status": "processed"}
+        # The analyzer tools only ever look at ~4000 chars — build that
+        # view once with the deterministic chunk selector, so long docs
+        # contribute head + tail instead of only the first page, and
+        # downstream nodes never re-send the full (potentially multi-MB)
+        # text in tool payloads.
+        return {"raw_text": raw_text,
+                "analysis_text": extract_relevant_chunks(raw_text, max_chars=4000),
+                "language": language, "status": Status.PROCESSED}
+    except Exception as e:
+        return {"error": str(e), "status": Status.FAILED}
+
+
+def _combined_analysis(raw_text: str, language: str) -> dict:
+    """
+    Single-call analysis: one JSON-mode request returns summary, key_info
+    and risks together, so the document tokens are prefilled once instead
+    of three times. Returns None on any failure so the caller can fall
+    back to the three-call fan-out.
+    """
+    try:
+        content = retry_with_backoff(
+            analyze_document_combined.invoke, {"text": raw_text, "language": language})
+        if content.startswith("Error"):
+            return None
+        data = _extract_json(content)
+        if not isinstance(data, dict):
+            return None
+        result = {k: data.get(k) for k in ("summary", "key_info", "risks")}
+        if all(isinstance(v, str) and v.strip() for v in result.values()):
+            return result
+        return None
     except Exception as e:
-        return {**state, "error": str(e), "status": "failed"}
+        log.info(f"[Combined] Falling back to parallel fan-out: {e}")
+        return None
 
 
 def parallel_analysis(state: DocumentState) -> DocumentState:
     """
-    ASYNC UPGRADE: delegates to async_parallel_analysis via asyncio.run()
-    so all three LLM calls run concurrently with true async I/O.
-    Falls back to sync ThreadPoolExecutor if an event loop is already running.
+    ASYNC UPGRADE: delegates to async_parallel_analysis on the shared
+    loop thread so all three LLM calls run concurrently with true async
+    I/O. Falls back to sync ThreadPoolExecutor if the async path fails.
+
+    COMBINED UPGRADE: tries one structured-JSON call covering all three
+    analyses first — the fan-out below only runs if that call fails.
+
+    PREFIX INVARIANT: the fan-out tools build their prompts as
+    <shared system line + document> followed by a task-specific suffix,
+    all on the same model/temperature — keep it that way so provider
+    prefix caching only prefills the document once across the 3 calls.
     """
-    print(f"\n[Parallel] Running Agents 2, 3, 4 (async)...")
-    raw_text = state["raw_text"]
+    log.info(f"\n[Parallel] Running Agents 2, 3, 4...")
+    raw_text = state.get("analysis_text") or state["raw_text"][:4000]
     language = state.get("language", "English")
 
+    combined = _combined_analysis(raw_text, language)
+    if combined:
+        log.info("[Parallel] Combined single-call analysis complete!")
+        return {**combined, "status": Status.ANALYZED}
+
     try:
         # Use async implementation for true concurrent I/O
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Already in an async context (e.g. tests) — fall back to threads
-            raise RuntimeError("event loop already running")
-        result = asyncio.run(_async_parallel_analysis(raw_text, language))
+        result = _run_async(_async_parallel_analysis(raw_text, language))
     except RuntimeError:
         # Fallback: thread-based parallelism
         result = _sync_parallel_analysis(raw_text, language)
 
     if result.get("error"):
-        return {**state, "error": result["error"], "status": "failed"}
+        return {"error": result["error"], "status": Status.FAILED}
 
-    print("[Parallel] All 3 agents complete!")
-    return {**state, **result, "status": "analyzed"}
+    log.info("[Parallel] All 3 agents complete!")
+    return {**result, "status": Status.ANALYZED}
 
 
 async def _async_parallel_analysis(raw_text: str, language: str) -> dict:
@@ -219,33 +470,33 @@ async def _async_parallel_analysis(raw_text: str, language: str) -> dict:
     ~60% faster than sequential, no thread overhead.
     """
     async def run_summarizer():
-        print("[Agent 2] Summarizing (async)...")
+        log.info("[Agent 2] Summarizing (async)...")
         result = await async_retry_with_backoff(
             summarize_text.ainvoke, {"text": raw_text, "language": language}
         )
         if isinstance(result, str) and result.startswith("Error"):
             raise RuntimeError(f"Summarizer: {result}")
-        print(f"[Agent 2] Done ({len(result)} chars)")
+        log.info(f"[Agent 2] Done ({len(result)} chars)")
         return result
 
     async def run_extractor():
-        print("[Agent 3] Extracting key info (async)...")
+        log.info("[Agent 3] Extracting key info (async)...")
         result = await async_retry_with_backoff(
             extract_key_info.ainvoke, {"text": raw_text, "language": language}
         )
         if isinstance(result, str) and result.startswith("Error"):
             raise RuntimeError(f"Extractor: {result}")
-        print(f"[Agent 3] Done ({len(result)} chars)")
+        log.info(f"[Agent 3] Done ({len(result)} chars)")
         return result
 
     async def run_risk():
-        print("[Agent 4] Analyzing risks (async)...")
+        log.info("[Agent 4] Analyzing risks (async)...")
         result = await async_retry_with_backoff(
             flag_risks.ainvoke, {"text": raw_text, "language": language}
         )
         if isinstance(result, str) and result.startswith("Error"):
             raise RuntimeError(f"Risk flagger: {result}")
-        print(f"[Agent 4] Done ({len(result)} chars)")
+        log.info(f"[Agent 4] Done ({len(result)} chars)")
         return result
 
     try:
@@ -279,17 +530,16 @@ def _sync_parallel_analysis(raw_text: str, language: str) -> dict:
             raise RuntimeError(f"Risk flagger: {result}")
         return result
 
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        fs = executor.submit(run_summarizer), executor.submit(run_extractor), executor.submit(run_risk)
-        try:
-            summary, key_info, risks = fs[0].result(), fs[1].result(), fs[2].result()
-            return {"summary": summary, "key_info": key_info, "risks": risks}
-        except Exception as e:
-            return {"error": str(e)}
+    fs = _EXECUTOR.submit(run_summarizer), _EXECUTOR.submit(run_extractor), _EXECUTOR.submit(run_risk)
+    try:
+        summary, key_info, risks = fs[0].result(), fs[1].result(), fs[2].result()
+        return {"summary": summary, "key_info": key_info, "risks": risks}
+    except Exception as e:
+        return {"error": str(e)}
 
 
 def calculate_risk_score(state: DocumentState) -> DocumentState:
-    print(f"\n[Risk Score] Calculating...")
+    log.info(f"\n[Risk Score] Calculating...")
     try:
         prompt = f"""You are a document risk assessment expert.
 Analyze this document and assign a RISK score from 0 to 100.
@@ -317,71 +567,159 @@ Risk Analysis: {state['risks'][:1000]}
 Return ONLY JSON: {{"score": 8, "reasoning": "..."}}
 
 JSON:"""
-        response = retry_with_backoff(llm.invoke, prompt)
-        match    = re.search(r'\{.*?\}', response.content.strip(), re.DOTALL)
-        if match:
-            data      = json.loads(match.group())
+        response = retry_with_backoff(_get_llm().invoke, prompt)
+        data     = _extract_json(response.content)
+        if isinstance(data, dict):
             score     = max(0, min(100, int(data.get("score", 50))))
             reasoning = data.get("reasoning", "")
-            print(f"[Risk Score] {score}/100 — {reasoning}")
-            return {**state, "risk_score": score, "risk_reasoning": reasoning}
-        return {**state, "risk_score": 50, "risk_reasoning": "Could not calculate score"}
+            log.info(f"[Risk Score] {score}/100 — {reasoning}")
+            return {"risk_score": score, "risk_reasoning": reasoning}
+        return {"risk_score": 50, "risk_reasoning": "Could not calculate score"}
     except Exception as e:
-        return {**state, "risk_score": 50, "risk_reasoning": f"Error: {e}"}
+        return {"risk_score": 50, "risk_reasoning": f"Error: {e}"}
 
 
-def report_agent(state: DocumentState) -> DocumentState:
-    print(f"\n[Agent 5] Generating report...")
+def _generate_report(state: DocumentState) -> str:
     language  = state.get("language", "English")
     lang_note = f"\nIMPORTANT: Write the entire report in {language}." if language != "English" else ""
-    try:
-        prompt = f"""Create a professional document analysis report.
+    prompt = _REPORT_TMPL(summary=state["summary"], key_info=state["key_info"],
+                          risks=state["risks"], risk_score=state["risk_score"],
+                          filename=state["filename"], lang_note=lang_note)
+    response = retry_with_backoff(_get_llm().invoke, prompt)
+    return response.content.strip()
 
-SUMMARY:\n{state['summary']}
-KEY INFORMATION:\n{state['key_info']}
-RISK ANALYSIS:\n{state['risks']}
-RISK SCORE: {state['risk_score']}/100
 
-Document: {state['filename']}{lang_note}
-
-Report:"""
-        response = retry_with_backoff(llm.invoke, prompt)
-        report   = response.content.strip()
-        print(f"[Agent 5] Done ({len(report)} chars)")
-        return {**state, "report": report, "status": "complete"}
+def generate_suggested_questions(text: str, language: str = "English") -> list:
+    try:
+        # Like detect_language, the prompt depends only on a bounded
+        # prefix (+ language), so cache hits skip the LLM call entirely.
+        cache_key = agents_cache.make_text_key("questions", f"{language}:{text[:3000]}")
+        cached    = agents_cache.get_analysis(cache_key)
+        if cached is not None:
+            return cached["value"]
+        lang_note = f"Generate questions in {language}." if language != "English" else ""
+        prompt    = _QUESTIONS_TMPL(lang_note=lang_note, text=text[:3000])
+        # JSON mode forces well-formed output, so a successful generation
+        # is never thrown away on a parse failure; the regex path stays
+        # as a safety net for providers that ignore response_format.
+        response = retry_with_backoff(
+            _get_llm().bind(response_format={"type": "json_object"}).invoke, prompt)
+        content  = response.content.strip()
+        try:
+            questions = list(json.loads(content).get("questions", []))[:5]
+        except (json.JSONDecodeError, AttributeError):
+            data      = _extract_json(content, "[", "]")
+            questions = list(data)[:5] if isinstance(data, list) else []
+        if questions:
+            agents_cache.set_analysis(cache_key, {"value": questions})
+        return questions
     except Exception as e:
-        return {**state, "error": str(e), "status": "failed"}
+        log.info(f"[Questions] Error: {e}")
+        return []
 
 
-def generate_suggested_questions(text: str, language: str = "English") -> list:
+def finalize_parallel(state: DocumentState) -> DocumentState:
+    """
+    Report generation and question suggestion only share upstream state,
+    so run both LLM calls concurrently — the pipeline tail costs
+    max(latency) instead of the sum.
+    """
+    log.info(f"\n[Agents 5+6] Generating report and questions in parallel...")
+    report_future    = _EXECUTOR.submit(_generate_report, state)
+    questions_future = _EXECUTOR.submit(
+        generate_suggested_questions,
+        state.get("analysis_text") or state["raw_text"], state.get("language", "English"))
     try:
-        lang_note = f"Generate questions in {language}." if language != "English" else ""
-        prompt    = f"""Generate exactly 5 specific questions a user might ask about this document. {lang_note}
-Return ONLY a JSON array of 5 strings.
+        report = report_future.result()
+    except Exception as e:
+        questions_future.cancel()
+        return {"error": str(e), "status": Status.FAILED}
+    questions = questions_future.result()  # returns [] on error
 
-Document:\n{text[:3000]}
+    log.info(f"[Agents 5+6] Report done ({len(report)} chars), {len(questions)} questions")
+    return {"report": report, "suggested_questions": questions, "status": Status.COMPLETE}
 
-Questions:"""
-        response = retry_with_backoff(llm.invoke, prompt)
-        match    = re.search(r'\[.*?\]', response.content.strip(), re.DOTALL)
-        if match:
-            return json.loads(match.group())[:5]
-        return []
+
+_FINALIZE_TMPL = """You are a document analysis expert. Complete three tasks in one pass.
+
+TASK 1 — RISK SCORE: Assign a RISK score from 0 to 100.
+- The score represents DANGER level — higher score = MORE dangerous/risky
+- Consider the DOCUMENT TYPE first:
+  * Certificate, award, informational document → score 0-10
+  * Well-structured resume/CV → score 10-25
+  * Complete contract with minor issues → score 25-45
+  * Contract with several missing clauses → score 45-65
+  * Contract with critical missing sections → score 65-85
+  * Dangerous or critically incomplete legal document → score 85-100
+
+TASK 2 — REPORT: Create a professional document analysis report with clear
+sections, based on the summary, key information, and risk analysis below.
+
+TASK 3 — QUESTIONS: Write exactly 5 specific questions a user might ask
+about this document.
+{lang_note}
+Filename: {filename}
+SUMMARY:
+{summary}
+KEY INFORMATION:
+{key_info}
+RISK ANALYSIS:
+{risks}
+
+Return ONLY a JSON object of the form
+{{"score": <int>, "reasoning": "...", "report": "...", "questions": ["...", "...", "...", "...", "..."]}}.
+
+JSON:""".format
+
+
+def _fused_finalize(state: DocumentState) -> dict:
+    """
+    Single-call tail: one JSON-mode request returns the risk score,
+    reasoning, report and suggested questions together, collapsing three
+    serial LLM round-trips into one. Returns None on any failure so the
+    caller can fall back to the separate risk_score + finalize path.
+    """
+    try:
+        language  = state.get("language", "English")
+        lang_note = f"\nIMPORTANT: Write the reasoning, report and questions in {language}.\n" if language != "English" else ""
+        prompt = _FINALIZE_TMPL(lang_note=lang_note, filename=state["filename"],
+                                summary=state["summary"], key_info=state["key_info"],
+                                risks=state["risks"][:1500])
+        response = retry_with_backoff(
+            _get_llm().bind(response_format={"type": "json_object"}).invoke, prompt)
+        data      = json.loads(response.content.strip())
+        score     = max(0, min(100, int(data.get("score", 50))))
+        report    = data.get("report")
+        questions = list(data.get("questions", []))[:5]
+        if not (isinstance(report, str) and report.strip()):
+            return None
+        log.info(f"[Finalize] Fused call done — score {score}/100, {len(questions)} questions")
+        return {"risk_score": score, "risk_reasoning": data.get("reasoning", ""),
+                "report": report.strip(), "suggested_questions": questions,
+                "status": Status.COMPLETE}
     except Exception as e:
-        print(f"[Questions] Error: {e}")
-        return []
+        log.info(f"[Finalize] Falling back to separate calls: {e}")
+        return None
 
 
-def questions_agent(state: DocumentState) -> DocumentState:
-    print(f"\n[Questions] Generating suggestions...")
-    questions = generate_suggested_questions(state["raw_text"], state.get("language", "English"))
-    print(f"[Questions] Generated {len(questions)} questions")
-    return {**state, "suggested_questions": questions}
+def finalize_agent(state: DocumentState) -> DocumentState:
+    """
+    Replaces the risk_score → finalize_parallel chain with one fused LLM
+    call; the separate nodes are kept as the fallback path.
+    """
+    log.info(f"\n[Finalize] Scoring, report and questions in one call...")
+    fused = _fused_finalize(state)
+    if fused is not None:
+        return fused
+    risk_delta = calculate_risk_score(state)
+    return {**risk_delta, **finalize_parallel({**state, **risk_delta})}
 
 
 def should_continue(state: DocumentState) -> str:
-    if state.get("status") == "failed":
-        print(f"[Router] Failed: {state.get('error')}")
+    # Single membership check against the enum — the same router serves
+    # every conditional edge in the pipeline.
+    if state.get("status") == Status.FAILED:
+        log.info(f"[Router] Failed: {state.get('error')}")
         return END
     return "continue"
 
@@ -390,55 +728,90 @@ def build_pipeline():
     graph = StateGraph(DocumentState)
     graph.add_node("document_processor", document_processor)
     graph.add_node("parallel_analysis",  parallel_analysis)
-    graph.add_node("risk_score",         calculate_risk_score)
-    graph.add_node("report_generator",   report_agent)
-    graph.add_node("questions_agent",    questions_agent)
+    graph.add_node("finalize_agent",     finalize_agent)
 
     graph.set_entry_point("document_processor")
     graph.add_conditional_edges("document_processor", should_continue, {"continue": "parallel_analysis", END: END})
-    graph.add_conditional_edges("parallel_analysis",  should_continue, {"continue": "risk_score",        END: END})
-    graph.add_conditional_edges("risk_score",         should_continue, {"continue": "report_generator",  END: END})
-    graph.add_conditional_edges("report_generator",   should_continue, {"continue": "questions_agent",   END: END})
-    graph.add_edge("questions_agent", END)
+    graph.add_conditional_edges("parallel_analysis",  should_continue, {"continue": "finalize_agent",    END: END})
+    graph.add_edge("finalize_agent", END)
     return graph.compile()
 
 
-pipeline = build_pipeline()
+@lru_cache(maxsize=None)
+def _get_pipeline():
+    """Compile the analysis graph on first use."""
+    return build_pipeline()
 
 
 def answer_question(question: str, filename: str, language: str = "English") -> str:
-    print(f"\n[Q&A] {question}")
+    log.info(f"\n[Q&A] {question}")
     try:
         context   = search_document.invoke({"query": question, "filename": ""})
         lang_note = f"Answer in {language}." if language != "English" else ""
-        prompt    = f"""You are a document analysis assistant.
-Answer based ONLY on the document content. Be specific and direct. {lang_note}
+        prompt    = _ANSWER_TMPL(lang_note=lang_note, filename=filename,
+                                 question=question, context=context)
+        # Keyed by filename so rephrased questions hit the semantic tier
+        # without ever reusing an answer from a different document.
+        return llm_cache.cached_invoke(
+            prompt, f"answer:{filename}",
+            lambda: retry_with_backoff(_get_llm().invoke, prompt).content.strip())
+    except Exception as e:
+        return f"Error answering question: {e}"
 
-Document: {filename}
-Question: {question}
 
-Relevant sections:
-{context}
+def answer_questions_bulk(questions: list, filename: str, language: str = "English") -> list:
+    """Answer several questions about one document in a single burst.
 
-Answer:"""
-        response = retry_with_backoff(llm.invoke, prompt)
-        return response.content.strip()
+    Retrieval embeds all questions in one MiniLM pass, then the LLM
+    calls go out as concurrent HTTP requests via abatch — roughly one
+    round-trip of wall clock instead of one per question. Answers are
+    written into the per-document response cache so later single asks
+    of the same question are free.
+    """
+    if not questions:
+        return []
+    log.info(f"\n[Q&A] Bulk answering {len(questions)} questions")
+    try:
+        contexts  = search_documents_batch(questions, "")
+        lang_note = f"Answer in {language}." if language != "English" else ""
+        prompts   = [_ANSWER_TMPL(lang_note=lang_note, filename=filename,
+                                  question=q, context=c)
+                     for q, c in zip(questions, contexts)]
+        responses = _run_async(async_retry_with_backoff(
+            _get_llm().abatch, prompts, config={"max_concurrency": 8}))
+        answers = [r.content.strip() for r in responses]
+        for prompt, answer in zip(prompts, answers):
+            llm_cache.cached_invoke(prompt, f"answer:{filename}", lambda a=answer: a)
+        return answers
     except Exception as e:
-        return f"Error answering question: {e}"
+        return [f"Error answering question: {e}"] * len(questions)
 
 
 def analyze_document(file_path: str) -> dict:
     filename = os.path.basename(file_path)
-    print(f"\n{'='*50}\nStarting analysis: {filename}\n{'='*50}")
+    log.info(f"\n{'='*50}\nStarting analysis: {filename}\n{'='*50}")
 
-    result = pipeline.invoke(DocumentState(
-        file_path=file_path, filename=filename, raw_text="",
+    # Content-hash cache: an identical PDF (and same model) skips the
+    # whole pipeline — LLM latency dominates, so hits are near-free.
+    cache_key = None
+    try:
+        with open(file_path, "rb") as f:
+            cache_key = agents_cache.make_key(f.read())
+        cached = agents_cache.get_analysis(cache_key)
+        if cached:
+            log.info(f"[Cache] Hit for {filename} — skipping pipeline.")
+            return {**cached, "filename": filename}
+    except OSError:
+        pass
+
+    result = _get_pipeline().invoke(DocumentState(
+        file_path=file_path, filename=filename, raw_text="", analysis_text="",
         summary="", key_info="", risks="", risk_score=0,
         risk_reasoning="", report="", language="English",
-        suggested_questions=[], status="starting", error=""
+        suggested_questions=[], status=Status.STARTING, error=""
     ))
 
-    return {
+    out = {
         "filename":            result["filename"],
         "raw_text":            result["raw_text"],
         "summary":             result["summary"],
@@ -452,6 +825,31 @@ def analyze_document(file_path: str) -> dict:
         "status":              result["status"],
         "error":               result.get("error", "")
     }
+    if cache_key and out["status"] == Status.COMPLETE:
+        agents_cache.set_analysis(cache_key, out)
+    return out
+
+
+def analyze_documents(paths: list, concurrency: int = 8) -> list:
+    """
+    Analyze several PDFs concurrently, overlapping their LLM wait time.
+    A semaphore caps in-flight documents; results come back in input
+    order, with per-document failures reported as failed result dicts
+    instead of aborting the batch.
+    """
+    async def _run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(path):
+            async with semaphore:
+                return await asyncio.to_thread(analyze_document, path)
+
+        return await asyncio.gather(*(_one(p) for p in paths), return_exceptions=True)
+
+    results = asyncio.run(_run())
+    return [r if not isinstance(r, Exception)
+            else {"filename": os.path.basename(p), "status": Status.FAILED, "error": str(r)}
+            for p, r in zip(paths, results)]
 
 
 # ══════════════════════════════════════════════════════════════════════
@@ -487,7 +885,7 @@ class ImprovementState(TypedDict):
 # IMPROVEMENT PIPELINE — AGENTS
 # ══════════════════════════════════════════════════════════════════════
 def detect_document_type(state: ImprovementState) -> ImprovementState:
-    print(f"\n[DocType] Detecting for: {state['filename']}")
+    log.info(f"\n[DocType] Detecting for: {state['filename']}")
     try:
         prompt = f"""Classify this document into ONE of: Resume/CV, Legal Contract, Report, Certificate.
 Return ONLY the type name.
@@ -496,14 +894,14 @@ Filename: {state['filename']}
 Content: {state['raw_text'][:1000]}
 
 Type:"""
-        response = retry_with_backoff(llm.invoke, prompt)
+        response = retry_with_backoff(_get_llm().invoke, prompt)
         doc_type = response.content.strip()
         known    = ["Resume/CV", "Legal Contract", "Report", "Certificate"]
         doc_type = next((t for t in known if t.lower() in doc_type.lower()), "Report")
-        print(f"[DocType] {doc_type}")
-        return {**state, "doc_type": doc_type, "improvement_status": "improving"}
+        log.info(f"[DocType] {doc_type}")
+        return {"doc_type": doc_type, "improvement_status": "improving"}
     except Exception as e:
-        return {**state, "doc_type": "Report", "error": str(e)}
+        return {"doc_type": "Report", "error": str(e)}
 
 
 DOC_TYPE_CRITIQUE_RULES = {
@@ -535,7 +933,7 @@ DOC_TYPE_IMPROVE_RULES = {
 
 def critique_agent(state: ImprovementState) -> ImprovementState:
     iteration        = state.get("iteration", 0) + 1
-    print(f"\n[Critique] Round {iteration}")
+    log.info(f"\n[Critique] Round {iteration}")
     base_text        = state.get("improved_text") or state["raw_text"]
     rules            = DOC_TYPE_CRITIQUE_RULES.get(state["doc_type"], DOC_TYPE_CRITIQUE_RULES["Report"])
     text_to_critique = extract_relevant_chunks(base_text, focus_hint="", max_chars=5000)
@@ -573,16 +971,16 @@ Document (iteration {iteration} version):
 {text_to_critique}
 
 Critique (new issues only):"""
-        response = retry_with_backoff(llm.invoke, prompt)
+        response = retry_with_backoff(_get_llm().invoke, prompt)
         critique = response.content.strip()
-        print(f"[Critique] Done ({len(critique)} chars)")
-        return {**state, "critique": critique, "iteration": iteration}
+        log.info(f"[Critique] Done ({len(critique)} chars)")
+        return {"critique": critique, "iteration": iteration}
     except Exception as e:
-        return {**state, "error": str(e), "improvement_status": "failed"}
+        return {"error": str(e), "improvement_status": "failed"}
 
 
 def improvement_agent(state: ImprovementState) -> ImprovementState:
-    print(f"\n[Improvement] Round {state['iteration']}")
+    log.info(f"\n[Improvement] Round {state['iteration']}")
     base_text       = state.get("improved_text") or state["raw_text"]
     improve_rules   = DOC_TYPE_IMPROVE_RULES.get(state["doc_type"], DOC_TYPE_IMPROVE_RULES["Report"])
     text_to_improve = extract_relevant_chunks(base_text, focus_hint=state.get("critique", ""), max_chars=4000)
@@ -621,13 +1019,13 @@ Current document (round {state['iteration']} input):
 {text_to_improve}
 
 Improved Document (round {state['iteration']} output):"""
-        response      = retry_with_backoff(llm.invoke, prompt)
+        response      = retry_with_backoff(_get_llm().invoke, prompt)
         improved_text = response.content.strip()
         diff_markers  = generate_diff_markers(base_text, improved_text)
-        print(f"[Improvement] Done ({len(improved_text)} chars)")
-        return {**state, "improved_text": improved_text, "diff_markers": diff_markers}
+        log.info(f"[Improvement] Done ({len(improved_text)} chars)")
+        return {"improved_text": improved_text, "diff_markers": diff_markers}
     except Exception as e:
-        return {**state, "error": str(e), "improvement_status": "failed"}
+        return {"error": str(e), "improvement_status": "failed"}
 
 
 def generate_diff_markers(original: str, improved: str) -> str:
@@ -650,7 +1048,7 @@ def verifier_agent(state: ImprovementState) -> ImprovementState:
     Adversarial verifier (temperature=0). Scores relative to the previous
     round to guarantee progressive improvement across iterations.
     """
-    print(f"\n[Verifier] Round {state['iteration']} (adversarial, t=0)")
+    log.info(f"\n[Verifier] Round {state['iteration']} (adversarial, t=0)")
     try:
         text_to_score = extract_relevant_chunks(
             state["improved_text"],
@@ -695,17 +1093,16 @@ Return ONLY JSON:
 JSON:""")
         ]
 
-        response = retry_with_backoff(verifier_llm.invoke, messages)
+        response = retry_with_backoff(_get_verifier_llm().invoke, messages)
         content  = response.content.strip()
 
-        match = re.search(r'\{.*?\}', content, re.DOTALL)
-        if match:
-            data      = json.loads(match.group())
+        data = _extract_json(content)
+        if isinstance(data, dict):
             score     = max(0, min(100, int(data.get("score", 50))))
             verdict   = data.get("verdict", "")
             remaining = data.get("remaining_issues", "")
 
-            print(f"[Verifier] Score: {score}/100 — {verdict}")
+            log.info(f"[Verifier] Score: {score}/100 — {verdict}")
 
             history = list(state.get("improvement_history", []))
             history.append({
@@ -717,25 +1114,25 @@ JSON:""")
                 "verdict":       verdict,
                 "remaining":     remaining
             })
-            return {**state, "improvement_score": score, "improvement_history": history}
+            return {"improvement_score": score, "improvement_history": history}
 
-        return {**state, "improvement_score": 50}
+        return {"improvement_score": 50}
 
     except Exception as e:
-        print(f"[Verifier] Error: {e}")
-        return {**state, "improvement_score": 50, "error": str(e)}
+        log.info(f"[Verifier] Error: {e}")
+        return {"improvement_score": 50, "error": str(e)}
 
 
 def finalizer(state: ImprovementState) -> ImprovementState:
-    print(f"\n[Finalizer] After {state['iteration']} iteration(s)")
+    log.info(f"\n[Finalizer] After {state['iteration']} iteration(s)")
     history = state.get("improvement_history", [])
     if history:
         best       = max(history, key=lambda x: x["score"])
         final_text = best["improved_text"]
-        print(f"[Finalizer] Best score: {best['score']}/100")
+        log.info(f"[Finalizer] Best score: {best['score']}/100")
     else:
         final_text = state.get("improved_text", state["raw_text"])
-    return {**state, "final_text": final_text, "improvement_status": "done"}
+    return {"final_text": final_text, "improvement_status": "done"}
 
 
 def should_loop(state: ImprovementState) -> str:
@@ -744,10 +1141,10 @@ def should_loop(state: ImprovementState) -> str:
     status    = state.get("improvement_status", "improving")
 
     if status == "failed":   return "finalize"
-    if score >= 85:          print(f"[Router] ✅ {score}/100 — done."); return "finalize"
-    if iteration >= 3:       print(f"[Router] ⚠️ Max iterations at {score}/100."); return "finalize"
+    if score >= 85:          log.info(f"[Router] ✅ {score}/100 — done."); return "finalize"
+    if iteration >= 3:       log.info(f"[Router] ⚠️ Max iterations at {score}/100."); return "finalize"
 
-    print(f"[Router] 🔄 {score}/100 < 85, round {iteration}/3 — looping.")
+    log.info(f"[Router] 🔄 {score}/100 < 85, round {iteration}/3 — looping.")
     return "loop"
 
 
@@ -804,18 +1201,18 @@ def improve_document(file_path: str, existing_analysis: dict = None,
     filename  = os.path.basename(file_path)
     thread_id = thread_id or str(uuid.uuid4())
 
-    print(f"\n{'='*50}")
-    print(f"Improvement loop: {filename}  [thread: {thread_id[:8]}...]")
-    print(f"{'='*50}")
+    log.info(f"\n{'='*50}")
+    log.info(f"Improvement loop: {filename}  [thread: {thread_id[:8]}...]")
+    log.info(f"{'='*50}")
 
     if existing_analysis and existing_analysis.get("raw_text"):
-        print("[Improve] Reusing existing analysis.")
+        log.info("[Improve] Reusing existing analysis.")
         base = existing_analysis
     else:
-        print("[Improve] Running full analysis pipeline first.")
+        log.info("[Improve] Running full analysis pipeline first.")
         base = analyze_document(file_path)
-        if base.get("status") == "failed":
-            return {"error": base.get("error", "Analysis failed"), "status": "failed"}
+        if base.get("status") == Status.FAILED:
+            return {"error": base.get("error", "Analysis failed"), "status": Status.FAILED}
 
     initial_state = ImprovementState(
         file_path=file_path, filename=filename,
@@ -868,7 +1265,7 @@ def resume_improvement(thread_id: str) -> dict:
     The pipeline resumes from the last successfully completed node —
     no re-running of already-finished agents.
     """
-    print(f"\n[Resume] Resuming thread: {thread_id[:8]}...")
+    log.info(f"\n[Resume] Resuming thread: {thread_id[:8]}...")
     with _get_checkpointer() as checkpointer:
         imp_pipeline = build_improvement_pipeline(checkpointer=checkpointer)
         config       = {"configurable": {"thread_id": thread_id}}
@@ -895,7 +1292,16 @@ def resume_improvement(thread_id: str) -> dict:
 # CLI TEST
 # ══════════════════════════════════════════════════════════════════════
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2:
+        for result in analyze_documents(sys.argv[1:]):
+            print(f"\n{'='*50}\n{result['filename']}\n{'='*50}")
+            print(f"Status:    {result['status']}")
+            if result["status"] == "complete":
+                print(f"Language:  {result['language']}")
+                print(f"Risk Score:{result['risk_score']}/100")
+            else:
+                print(f"Error:     {result.get('error', '')}")
+    elif len(sys.argv) > 1:
         result = analyze_document(sys.argv[1])
         print(f"\n{'='*50}\nFINAL REPORT\n{'='*50}")
         print(result["report"])
@@ -903,4 +1309,4 @@ if __name__ == "__main__":
         print(f"Language:  {result['language']}")
         print(f"Risk Score:{result['risk_score']}/100")
     else:
-        print("Usage: python src/agents.py <path_to_pdf>")
\ No newline at end of file
+        print("Usage: python -m src.agents <path_to_pdf> [more_pdfs...]")
\ No newline at end of file
@@ -0,0 +1,161 @@
+import sqlite3
+import os
+import json
+import threading
+import time
+import hashlib
+
+from dotenv import load_dotenv
+
+# Resolve .env before reading CHAT_MODEL below — this module is imported
+# ahead of the entry points' own load_dotenv() calls, and keys built from
+# the default model would survive a configured model switch.
+load_dotenv()
+
+# ── Analysis result cache ─────────────────────────────────────────────
+# Keyed by SHA-256 of the PDF bytes plus the chat model, so re-analyzing
+# an identical document skips every LLM round-trip while a model change
+# invalidates old entries naturally.
+CACHE_DB    = "logs/agent_cache.db"
+TTL_SECONDS = 30 * 86400
+CHAT_MODEL  = os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile")
+
+# One long-lived connection behind a lock, same treatment database.py
+# got: per-call connect replayed the DDL and paid connection setup on
+# every cache hit, several times per pipeline run.
+_CONN = None
+_LOCK = threading.Lock()
+
+
+def _get_conn():
+    global _CONN
+    if _CONN is None:
+        os.makedirs("logs", exist_ok=True)
+        _CONN = sqlite3.connect(CACHE_DB, check_same_thread=False, isolation_level=None)
+        _CONN.execute("PRAGMA journal_mode=WAL")
+        _CONN.execute("PRAGMA synchronous=NORMAL")
+        _CONN.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key        TEXT PRIMARY KEY,
+                result     TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        _CONN.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_cache (
+                hash       TEXT PRIMARY KEY,
+                text       TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        _CONN.execute("""
+            CREATE TABLE IF NOT EXISTS stored_sources (
+                filename    TEXT PRIMARY KEY,
+                chunk_count INTEGER NOT NULL,
+                created_at  REAL NOT NULL
+            )
+        """)
+        _CONN.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_paths (
+                path  TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size  INTEGER NOT NULL,
+                hash  TEXT NOT NULL
+            )
+        """)
+    return _CONN
+
+
+def make_key(pdf_bytes: bytes) -> str:
+    """Build the cache key for a document's raw bytes."""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    return f"{digest}:{CHAT_MODEL}"
+
+
+def make_text_key(namespace: str, prefix: str) -> str:
+    """Key a cached LLM result by a bounded text prefix. The model is
+    part of the key so entries invalidate on a CHAT_MODEL change."""
+    digest = hashlib.blake2b(prefix.encode("utf-8", "ignore"), digest_size=16).hexdigest()
+    return f"{namespace}:{digest}:{CHAT_MODEL}"
+
+
+def get_analysis(key: str):
+    """Return the cached analysis dict for key, or None on miss/expiry."""
+    with _LOCK:
+        row = _get_conn().execute(
+            "SELECT result, created_at FROM analysis_cache WHERE key = ?", (key,)
+        ).fetchone()
+    if not row or time.time() - row[1] > TTL_SECONDS:
+        return None
+    return json.loads(row[0])
+
+
+def _pdf_hash(conn, file_path: str) -> str:
+    """SHA-256 of the file's bytes, with an mtime+size precheck so an
+    unchanged path is not re-read and re-hashed on every call."""
+    stat = os.stat(file_path)
+    row  = conn.execute(
+        "SELECT mtime, size, hash FROM pdf_paths WHERE path = ?", (file_path,)
+    ).fetchone()
+    if row and row[0] == stat.st_mtime and row[1] == stat.st_size:
+        return row[2]
+    with open(file_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    conn.execute(
+        "INSERT OR REPLACE INTO pdf_paths (path, mtime, size, hash) VALUES (?, ?, ?, ?)",
+        (file_path, stat.st_mtime, stat.st_size, digest)
+    )
+    return digest
+
+
+def get_pdf_text(file_path: str):
+    """Return the cached extracted text for file_path, or None."""
+    with _LOCK:
+        conn = _get_conn()
+        row  = conn.execute(
+            "SELECT text FROM pdf_cache WHERE hash = ?", (_pdf_hash(conn, file_path),)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def set_pdf_text(file_path: str, text: str):
+    """Store the extracted text for file_path, keyed by content hash."""
+    with _LOCK:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO pdf_cache (hash, text, created_at) VALUES (?, ?, ?)",
+            (_pdf_hash(conn, file_path), text, time.time())
+        )
+
+
+def has_stored_source(filename: str) -> bool:
+    """True if filename was already ingested into the vector store."""
+    with _LOCK:
+        return _get_conn().execute(
+            "SELECT 1 FROM stored_sources WHERE filename = ?", (filename,)
+        ).fetchone() is not None
+
+
+def mark_stored_source(filename: str, chunk_count: int):
+    """Record that filename's chunks are in the vector store."""
+    with _LOCK:
+        _get_conn().execute(
+            "INSERT OR REPLACE INTO stored_sources (filename, chunk_count, created_at) VALUES (?, ?, ?)",
+            (filename, chunk_count, time.time())
+        )
+
+
+def clear_stored_sources():
+    """Forget every ingestion record — used when the vector store has
+    been reset and the side table no longer reflects reality."""
+    with _LOCK:
+        _get_conn().execute("DELETE FROM stored_sources")
+
+
+def set_analysis(key: str, result: dict):
+    """Store an analysis dict under key, replacing any stale entry."""
+    with _LOCK:
+        _get_conn().execute(
+            "INSERT OR REPLACE INTO analysis_cache (key, result, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(result), time.time())
+        )
@@ -1,16 +1,17 @@
-import os
 import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import logging
 
-from src.agents import analyze_document, answer_question
+from src.agents import analyze_document, answer_question, answer_questions_bulk
 from src.database import init_db, log_analysis, get_all_analyses, get_stats
 
+log = logging.getLogger("agents")
+
 # ── Initialize DB on import ───────────────────────────────────────────
 init_db()
 
 def process_document(file_path: str, original_filename: str = None) -> dict:
     """Main entry point — runs the full multi-agent pipeline."""
-    print(f"\n[Backend] Starting pipeline for: {file_path}")
+    log.info(f"[Backend] Starting pipeline for: {file_path}")
 
     result = analyze_document(file_path)
 
@@ -37,6 +38,11 @@ def ask_document(question: str, filename: str, language: str = "English") -> str
     return answer_question(question, filename, language)
 
 
+def ask_documents_bulk(questions: list, filename: str, language: str = "English") -> list:
+    """Answer several questions about an analyzed document in one burst."""
+    return answer_questions_bulk(questions, filename, language)
+
+
 def get_history() -> list:
     """Return all past analyses from SQLite."""
     rows = get_all_analyses()
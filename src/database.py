@@ -1,130 +1,189 @@
 import sqlite3
 import os
+import threading
+import logging
 from datetime import datetime, timezone
 
 DB_PATH = "logs/interactions.db"
 
+# Every entry point imports src.agents (which sets up the queue-backed
+# handler on this logger) before any DB function runs, so records here
+# propagate to it without duplicating the setup.
+log = logging.getLogger("agents")
+
+# One long-lived connection shared by every call. Per-call connect/close
+# re-parsed the schema and paid a journal fsync on every write; WAL with
+# synchronous=NORMAL keeps durability while removing the fsync stalls.
+# All access goes through _LOCK because Streamlit and the agent threads
+# share this module.
+_CONN = None
+_LOCK = threading.Lock()
+
+
+def _get_conn():
+    global _CONN
+    if _CONN is None:
+        os.makedirs("logs", exist_ok=True)
+        _CONN = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        _CONN.execute("PRAGMA journal_mode=WAL")
+        _CONN.execute("PRAGMA synchronous=NORMAL")
+        _CONN.execute("PRAGMA temp_store=MEMORY")
+        _CONN.execute("PRAGMA mmap_size=268435456")
+    return _CONN
+
+
+_initialized = False
+
+
 def init_db():
-    """Initialize the SQLite database."""
-    os.makedirs("logs", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS analyses (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp   TEXT NOT NULL,
-            filename    TEXT NOT NULL,
-            status      TEXT NOT NULL,
-            summary     TEXT,
-            key_info    TEXT,
-            risks       TEXT,
-            risk_score  INTEGER DEFAULT 0,
-            report      TEXT,
-            language    TEXT DEFAULT 'English',
-            error       TEXT,
-            char_count  INTEGER
-        )
-    """)
-
-    conn.commit()
-    conn.close()
-    print("[DB] Database initialized.")
+    """Initialize the SQLite database. Safe to call more than once —
+    repeat calls are no-ops."""
+    global _initialized
+    if _initialized:
+        return
+    with _LOCK:
+        conn = _get_conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp   TEXT NOT NULL,
+                filename    TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                summary     TEXT,
+                key_info    TEXT,
+                risks       TEXT,
+                risk_score  INTEGER DEFAULT 0,
+                report      TEXT,
+                language    TEXT DEFAULT 'English',
+                error       TEXT,
+                char_count  INTEGER
+            )
+        """)
+        # timestamp index serves the dashboard's ORDER BY; the composite
+        # covers get_analysis_by_filename's WHERE + ORDER in one seek.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_ts ON analyses(timestamp DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_file_ts ON analyses(filename, timestamp DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_status ON analyses(status)")
+        _initialized = True
+    log.info("[DB] Database initialized.")
 
 
 def log_analysis(filename, status, summary, key_info, risks, report,
                  risk_score=0, language="English", error=""):
     """Log a document analysis to SQLite."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO analyses
-        (timestamp, filename, status, summary, key_info, risks,
-         risk_score, report, language, error, char_count)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-        filename,
-        status,
-        summary,
-        key_info,
-        risks,
-        risk_score,
-        report,
-        language,
-        error,
-        len(report) if report else 0
-    ))
-
-    conn.commit()
-    conn.close()
-    print(f"[DB] Logged analysis for {filename}")
+    with _LOCK:
+        _get_conn().execute("""
+            INSERT INTO analyses
+            (timestamp, filename, status, summary, key_info, risks,
+             risk_score, report, language, error, char_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            filename,
+            status,
+            summary,
+            key_info,
+            risks,
+            risk_score,
+            report,
+            language,
+            error,
+            len(report) if report else 0
+        ))
+    log.info(f"[DB] Logged analysis for {filename}")
+
+
+def log_analyses_bulk(rows):
+    """Log many analyses in one transaction.
+
+    rows is a list of dicts with the same fields log_analysis takes.
+    executemany under a single BEGIN/COMMIT pays one fsync for the whole
+    batch instead of one per row — the difference on bulk uploads.
+    """
+    if not rows:
+        return
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    params = [(
+        row.get("timestamp", now),
+        row["filename"],
+        row["status"],
+        row.get("summary"),
+        row.get("key_info"),
+        row.get("risks"),
+        row.get("risk_score", 0),
+        row.get("report"),
+        row.get("language", "English"),
+        row.get("error", ""),
+        len(row["report"]) if row.get("report") else 0
+    ) for row in rows]
+    with _LOCK:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("""
+                INSERT INTO analyses
+                (timestamp, filename, status, summary, key_info, risks,
+                 risk_score, report, language, error, char_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    log.info(f"[DB] Logged {len(rows)} analyses")
 
 
 def get_all_analyses():
     """Retrieve all analyses from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM analyses ORDER BY timestamp DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with _LOCK:
+        return _get_conn().execute(
+            "SELECT * FROM analyses ORDER BY timestamp DESC"
+        ).fetchall()
 
 
 def get_analysis_by_filename(filename):
     """Retrieve the latest analysis for a specific file."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM analyses
-        WHERE filename = ?
-        ORDER BY timestamp DESC
-        LIMIT 1
-    """, (filename,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    with _LOCK:
+        return _get_conn().execute("""
+            SELECT * FROM analyses
+            WHERE filename = ?
+            ORDER BY timestamp DESC
+            LIMIT 1
+        """, (filename,)).fetchone()
 
 
 def get_stats():
     """Get summary statistics for the dashboard."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT COUNT(*) FROM analyses")
-    total = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM analyses WHERE status = 'complete'")
-    successful = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM analyses WHERE status = 'failed'")
-    failed = cursor.fetchone()[0]
-
-    cursor.execute("SELECT AVG(risk_score) FROM analyses WHERE status = 'complete'")
-    avg_risk = cursor.fetchone()[0] or 0
-
-    cursor.execute("""
-        SELECT filename, risk_score, language, timestamp
-        FROM analyses
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-    recent = [
-        {
-            "filename":   row[0],
-            "risk_score": row[1],
-            "language":   row[2],
-            "timestamp":  row[3]
-        }
-        for row in cursor.fetchall()
-    ]
-
-    conn.close()
+    with _LOCK:
+        conn = _get_conn()
+        # One aggregate pass over the table instead of four separate scans.
+        total, successful, failed, avg_risk = conn.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(status = 'complete'), 0),
+                   COALESCE(SUM(status = 'failed'), 0),
+                   COALESCE(AVG(CASE WHEN status = 'complete' THEN risk_score END), 0)
+            FROM analyses
+        """).fetchone()
+
+        recent = [
+            {
+                "filename":   row[0],
+                "risk_score": row[1],
+                "language":   row[2],
+                "timestamp":  row[3]
+            }
+            for row in conn.execute("""
+                SELECT filename, risk_score, language, timestamp
+                FROM analyses
+                ORDER BY timestamp DESC
+                LIMIT 5
+            """).fetchall()
+        ]
+
     return {
         "total":      total,
         "successful": successful,
         "failed":     failed,
         "avg_risk":   round(avg_risk, 1),
         "recent":     recent
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,132 @@
+import sqlite3
+import os
+import threading
+import time
+import hashlib
+
+from dotenv import load_dotenv
+
+# Resolve .env before reading CHAT_MODEL below — this module is imported
+# ahead of the entry points' own load_dotenv() calls, and a key built
+# from the wrong model would serve stale responses across model switches.
+load_dotenv()
+
+# ── LLM response cache ────────────────────────────────────────────────
+# Tier 1: exact match — SHA-256 of (model, task_tag, prompt) in SQLite.
+# Tier 2: semantic match — MiniLM embedding of the prompt, compared by
+# cosine similarity against prior prompts of the same task_tag; a hit
+# above SEMANTIC_THRESHOLD reuses the stored response, so rephrased
+# questions skip the LLM entirely, not just byte-identical ones.
+#
+# The semantic tier only serves Q&A tags ("answer:<filename>"), where
+# the tag pins the document and only the question wording varies. For
+# the analyzer tags the prompt is mostly document text, and a near-duplicate
+# document (v2 of a contract with one changed clause) could clear the
+# threshold and silently receive v1's risk analysis — those tags use the
+# exact tier alone.
+# Lives alongside the other caches in agent_cache.db — interactions.db
+# is user-facing analytics held open on a pooled WAL connection, and
+# high-churn cache writes don't belong in it.
+CACHE_DB           = "logs/agent_cache.db"
+TTL_SECONDS        = 30 * 86400
+SEMANTIC_THRESHOLD = 0.93
+CHAT_MODEL         = os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile")
+
+
+# One long-lived connection behind a lock (the same treatment
+# database.py and agents_cache got) — per-call connect replayed the DDL
+# on every cached LLM call.
+_CONN = None
+_LOCK = threading.Lock()
+
+
+def _get_conn():
+    global _CONN
+    if _CONN is None:
+        os.makedirs("logs", exist_ok=True)
+        _CONN = sqlite3.connect(CACHE_DB, check_same_thread=False, isolation_level=None)
+        _CONN.execute("PRAGMA journal_mode=WAL")
+        _CONN.execute("PRAGMA synchronous=NORMAL")
+        _CONN.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key        TEXT PRIMARY KEY,
+                task_tag   TEXT NOT NULL,
+                response   TEXT NOT NULL,
+                embedding  BLOB,
+                created_at REAL NOT NULL
+            )
+        """)
+    return _CONN
+
+
+def _make_key(task_tag: str, prompt: str) -> str:
+    digest = hashlib.sha256(f"{CHAT_MODEL}:{task_tag}:{prompt}".encode("utf-8", "ignore")).hexdigest()
+    return digest
+
+
+def _embed(prompt: str):
+    """Embed the prompt with the already-loaded MiniLM model. Imported
+    lazily to avoid a circular import with src.tools."""
+    try:
+        import numpy as np
+        from src.tools import embeddings
+        vec = np.asarray(embeddings.embed_query(prompt[:2000]), dtype="float32")
+        return vec / (np.linalg.norm(vec) or 1.0)
+    except Exception:
+        return None
+
+
+def _semantic_lookup(conn, task_tag: str, query_vec):
+    """Return the stored response whose prompt embedding is closest to
+    query_vec, if it clears SEMANTIC_THRESHOLD; else None."""
+    import numpy as np
+    rows = conn.execute(
+        "SELECT response, embedding, created_at FROM llm_cache "
+        "WHERE task_tag = ? AND embedding IS NOT NULL "
+        "ORDER BY created_at DESC LIMIT 200",
+        (task_tag,)
+    ).fetchall()
+    now = time.time()
+    best, best_sim = None, SEMANTIC_THRESHOLD
+    for response, blob, created_at in rows:
+        if now - created_at > TTL_SECONDS:
+            continue
+        sim = float(np.frombuffer(blob, dtype="float32") @ query_vec)
+        if sim > best_sim:
+            best, best_sim = response, sim
+    return best
+
+
+def cached_invoke(prompt: str, task_tag: str, invoke_fn):
+    """Return the LLM response content for prompt, serving exact (and,
+    for Q&A tags, near-duplicate) prompts from cache. invoke_fn() is
+    called only on a full miss and must return the response content
+    string."""
+    key = _make_key(task_tag, prompt)
+    with _LOCK:
+        row = _get_conn().execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+    if row and time.time() - row[1] <= TTL_SECONDS:
+        return row[0]
+
+    vec = None
+    if task_tag.startswith("answer:"):
+        vec = _embed(prompt)
+        if vec is not None:
+            with _LOCK:
+                hit = _semantic_lookup(_get_conn(), task_tag, vec)
+            if hit is not None:
+                return hit
+
+    # The LLM call runs outside the lock — holding it across a
+    # multi-second network round-trip would serialize every cached call
+    # in the process.
+    response = invoke_fn()
+    with _LOCK:
+        _get_conn().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, task_tag, response, embedding, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, task_tag, response, vec.tobytes() if vec is not None else None, time.time())
+        )
+    return response
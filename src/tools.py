@@ -1,6 +1,12 @@
 import os
+import atexit
+import queue
+import random
+import time
 import fitz  # PyMuPDF
+import httpx
 import pdfplumber
+from functools import lru_cache
 from langchain_core.tools import tool
 from langchain_chroma import Chroma
 from langchain_groq import ChatGroq
@@ -8,24 +14,77 @@ from langchain_core.documents import Document
 from dotenv import load_dotenv
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
+from src import agents_cache, llm_cache
+
 import warnings
 import logging
+from logging.handlers import QueueHandler, QueueListener
 warnings.filterwarnings("ignore")
 logging.getLogger("sentence_transformers").setLevel(logging.ERROR)
 logging.getLogger("transformers").setLevel(logging.ERROR)
 
+# Tools log from the pipeline's worker threads, so emission must stay a
+# lock-free enqueue rather than a contended stdout write. This is the
+# same guarded setup src.agents performs on the same logger — whichever
+# module is imported first wins, the other sees handlers and skips.
+log = logging.getLogger("agents")
+if not log.handlers:
+    _log_queue = queue.Queue(-1)
+    log.addHandler(QueueHandler(_log_queue))
+    _log_listener = QueueListener(_log_queue, logging.StreamHandler())
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    log.setLevel(logging.INFO)
+
 load_dotenv()
 
 # ── LLM & Embeddings ─────────────────────────────────────────────────
+@lru_cache(maxsize=None)
+def shared_http_clients():
+    """One pooled (sync, async) httpx client pair shared by every ChatGroq
+    instance, so concurrent agent calls reuse warm keep-alive connections
+    instead of paying a TCP+TLS handshake each."""
+    try:
+        import h2  # noqa: F401 — httpx needs it for HTTP/2 multiplexing
+        http2 = True
+    except ImportError:
+        http2 = False
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=8)
+    return (httpx.Client(http2=http2, limits=limits, timeout=60),
+            httpx.AsyncClient(http2=http2, limits=limits, timeout=60))
+
+
+_http_client, _http_async_client = shared_http_clients()
+
 llm = ChatGroq(
     model=os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile"),
     api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.3
+    temperature=0.3,
+    http_client=_http_client,
+    http_async_client=_http_async_client
 )
 
+def _embedder_model_kwargs() -> dict:
+    """Pick the best device/dtype available: CUDA in bfloat16 when a GPU
+    is present (half the bandwidth of fp32, no measurable quality loss
+    for sentence embeddings), plain fp32 CPU otherwise."""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            # SentenceTransformer takes the dtype in its nested
+            # model_kwargs, not as a top-level constructor argument.
+            return {"device": "cuda", "model_kwargs": {"torch_dtype": torch.bfloat16}}
+    except ImportError:
+        pass
+    return {"device": "cpu"}
+
+
 embeddings = HuggingFaceEmbeddings(
     model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={"device": "cpu"}
+    model_kwargs=_embedder_model_kwargs(),
+    # 64 chunks per transformer forward instead of one-at-a-time keeps
+    # the CPU GEMM kernels saturated during ingestion.
+    encode_kwargs={"batch_size": 64, "normalize_embeddings": True}
 )
 
 # ── ChromaDB ──────────────────────────────────────────────────────────
@@ -35,22 +94,74 @@ vectorstore = Chroma(
     collection_name="documents"
 )
 
+
+def _invoke_llm(prompt, client=None, task_tag: str = "", max_retries: int = 3, base_delay: float = 2.0) -> str:
+    """llm.invoke with exponential backoff + jitter on 429/5xx, returning
+    the response content.
+
+    The tools catch all exceptions and return "Error ..." strings, which
+    the retry wrappers in src.agents can never see — so transient API
+    blips must be retried here, before the except clause swallows them.
+    When task_tag is set, the call goes through the two-tier response
+    cache in src.llm_cache, so repeated or near-duplicate prompts skip
+    the API entirely.
+    """
+    client = client or llm
+
+    def _call() -> str:
+        last_error = None
+        for attempt in range(max_retries):
+            try:
+                return client.invoke(prompt).content.strip()
+            except Exception as e:
+                last_error = e
+                err_str = str(e).lower()
+                if "429" in err_str or "rate limit" in err_str or "502" in err_str or "503" in err_str:
+                    time.sleep(base_delay * (2 ** attempt) + random.uniform(0, base_delay))
+                else:
+                    raise
+        raise last_error
+
+    if task_tag:
+        return llm_cache.cached_invoke(prompt, task_tag, _call)
+    return _call()
+
+
+def warmup():
+    """Run one throwaway embed + collection touch so the first real
+    store_document call finds the model and HNSW index already hot."""
+    try:
+        embeddings.embed_query("warmup")
+        vectorstore._collection.count()
+    except Exception:
+        pass  # best-effort — a cold first call still works
+
+
 # ── Tool 1: Extract text from PDF ────────────────────────────────────
 @tool
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract raw text content from a PDF file."""
     try:
-        text = ""
+        # Parsing is a pure function of the bytes, so serve re-uploads
+        # from the content-hash cache instead of re-parsing.
+        cached = agents_cache.get_pdf_text(file_path)
+        if cached is not None:
+            log.info(f"[Tool] Reusing cached extraction for {file_path}")
+            return cached
+
+        # Collect per-page strings and join once — repeated += is O(n²)
+        # on large PDFs. Pages are read serially on purpose: a fitz
+        # Document is not safe to share across threads.
         with fitz.open(file_path) as doc:
-            for page in doc:
-                text += page.get_text()
+            text = "".join(page.get_text() for page in doc)
         if not text.strip():
             # fallback to pdfplumber
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() or ""
-        print(f"[Tool] Extracted {len(text)} characters from {file_path}")
-        return text.strip()
+                text = "".join(page.extract_text() or "" for page in pdf.pages)
+        log.info(f"[Tool] Extracted {len(text)} characters from {file_path}")
+        text = text.strip()
+        agents_cache.set_pdf_text(file_path, text)
+        return text
     except Exception as e:
         return f"Error extracting text: {e}"
 
@@ -62,29 +173,42 @@ def store_document(file_path: str, content: str) -> str:
     try:
         filename = os.path.basename(file_path)
 
-        # Check if document already exists
+        # O(1) dedupe: the side table answers "already stored?" without
+        # Chroma's get(where=...) metadata scan, which grows with the
+        # collection. The scan remains as a self-healing fallback for
+        # collections ingested before the table existed.
+        if agents_cache.has_stored_source(filename):
+            # The side table can outlive the vector store (e.g. the
+            # Chroma dir was deleted to reclaim space). An empty
+            # collection means every ingestion record is stale — drop
+            # them all and fall through to re-ingest.
+            if vectorstore._collection.count() > 0:
+                log.info(f"[Tool] Document {filename} already in ChromaDB, skipping.")
+                return f"Document {filename} already stored — skipping."
+            log.info("[Tool] Vector store is empty — resetting ingestion records.")
+            agents_cache.clear_stored_sources()
         existing = vectorstore.get(where={"source": filename})
         if existing and len(existing["ids"]) > 0:
-            print(f"[Tool] Document {filename} already in ChromaDB, skipping.")
+            agents_cache.mark_stored_source(filename, len(existing["ids"]))
+            log.info(f"[Tool] Document {filename} already in ChromaDB, skipping.")
             return f"Document {filename} already stored — skipping."
 
         chunk_size = 1000
         overlap    = 200
-        chunks     = []
-
-        for i in range(0, len(content), chunk_size - overlap):
-            chunk = content[i:i + chunk_size]
-            if chunk.strip():
-                chunks.append(Document(
-                    page_content=chunk,
-                    metadata={
-                        "source":   filename,
-                        "chunk_id": len(chunks)
-                    }
-                ))
+
+        slices = [content[i:i + chunk_size]
+                  for i in range(0, len(content), chunk_size - overlap)]
+        chunks = [Document(
+                      page_content=chunk,
+                      metadata={
+                          "source":   filename,
+                          "chunk_id": chunk_id
+                      })
+                  for chunk_id, chunk in enumerate(c for c in slices if c.strip())]
 
         vectorstore.add_documents(chunks)
-        print(f"[Tool] Stored {len(chunks)} chunks from {filename}")
+        agents_cache.mark_stored_source(filename, len(chunks))
+        log.info(f"[Tool] Stored {len(chunks)} chunks from {filename}")
         return f"Stored {len(chunks)} chunks from {filename} in ChromaDB."
     except Exception as e:
         return f"Error storing document: {e}"
@@ -104,38 +228,56 @@ def search_document(query: str, filename: str = "") -> str:
             return "No relevant sections found."
 
         combined = "\n\n---\n\n".join([r.page_content for r in results])
-        print(f"[Tool] Found {len(results)} relevant sections for: {query}")
+        log.info(f"[Tool] Found {len(results)} relevant sections for: {query}")
         return combined
     except Exception as e:
         return f"Error searching document: {e}"
 
 
-# ── Tool 4: Summarize text ────────────────────────────────────────────
-@tool
-def summarize_text(text: str, language: str = "English") -> str:
-    """Generate a concise summary of the provided text."""
+def search_documents_batch(queries: list, filename: str = "") -> list:
+    """Search for relevant sections for several queries at once.
+
+    All queries go through one MiniLM forward pass (embed_documents)
+    instead of per-call embed_query, then each vector hits the index via
+    similarity_search_by_vector. Returns one combined-context string per
+    query, in order.
+    """
     try:
-        lang_note = f"\nIMPORTANT: Respond entirely in {language}." if language != "English" else ""
-        prompt = f"""Summarize the following document concisely in 3-5 sentences.
-Focus on the main purpose, key parties involved, and core terms.{lang_note}
+        vecs    = embeddings.embed_documents([q[:2000] for q in queries])
+        results = []
+        for vec in vecs:
+            docs = vectorstore.similarity_search_by_vector(
+                vec,
+                k=5,
+                filter={"source": filename} if filename else None
+            )
+            results.append("\n\n---\n\n".join(d.page_content for d in docs)
+                           if docs else "No relevant sections found.")
+        log.info(f"[Tool] Batch-searched {len(queries)} queries")
+        return results
+    except Exception as e:
+        return [f"Error searching document: {e}"] * len(queries)
 
-Document:
-{text[:4000]}
 
-Summary:"""
-        response = llm.invoke(prompt)
-        return response.content.strip()
-    except Exception as e:
-        return f"Error summarizing: {e}"
+# The three analyzer tools below share a byte-identical prefix
+# (system line + document body) and diverge only after "TASK:". With the
+# same model and temperature, provider-side prefix caching can then skip
+# re-prefilling the document for the 2nd and 3rd calls of the fan-out.
+_ANALYSIS_PREFIX = """You are a document analysis assistant.
 
+DOCUMENT:
+{text}
 
-# ── Tool 5: Extract key information ──────────────────────────────────
-@tool
-def extract_key_info(text: str, language: str = "English") -> str:
-    """Extract key information like dates, parties, amounts, and clauses."""
-    try:
-        lang_note = f"\nIMPORTANT: Respond entirely in {language}." if language != "English" else ""
-        prompt = f"""Extract the following key information from this document.
+TASK: """
+
+# Full per-task templates, built once at import; call sites fill in the
+# per-call fields via the bound .format (same pattern as src.agents).
+_SUMMARIZE_TMPL = (_ANALYSIS_PREFIX + """Summarize the document above concisely in 3-5 sentences.
+Focus on the main purpose, key parties involved, and core terms.{lang_note}
+
+Summary:""").format
+
+_EXTRACT_TMPL = (_ANALYSIS_PREFIX + """Extract the following key information from the document above.
 Return as a structured list:
 
 - Document Type:
@@ -147,23 +289,9 @@ Return as a structured list:
 - Duration/Validity:
 {lang_note}
 
-Document:
-{text[:4000]}
-
-Extracted Information:"""
-        response = llm.invoke(prompt)
-        return response.content.strip()
-    except Exception as e:
-        return f"Error extracting info: {e}"
-
+Extracted Information:""").format
 
-# ── Tool 6: Flag risks ────────────────────────────────────────────────
-@tool
-def flag_risks(text: str, language: str = "English") -> str:
-    """Identify potential risks, red flags, and missing sections."""
-    try:
-        lang_note = f"\nIMPORTANT: Respond entirely in {language}." if language != "English" else ""
-        prompt = f"""Analyze this document for potential risks and issues.
+_RISKS_TMPL = (_ANALYSIS_PREFIX + """Analyze the document above for potential risks and issues.
 Identify and list:
 
 🔴 HIGH RISK — Critical issues that need immediate attention
@@ -172,22 +300,20 @@ Identify and list:
 ⚠️ MISSING — Important sections or clauses that are absent
 {lang_note}
 
-Document:
-{text[:4000]}
+Risk Analysis:""").format
 
-Risk Analysis:"""
-        response = llm.invoke(prompt)
-        return response.content.strip()
-    except Exception as e:
-        return f"Error flagging risks: {e}"
+_COMBINED_TMPL = """Analyze the document below and return ONLY a JSON object with three string values:
+- "summary": a concise 3-5 sentence summary covering the main purpose, key parties involved, and core terms
+- "key_info": a structured list with: Document Type, Parties Involved, Key Dates, Financial Amounts, Key Clauses/Terms, Obligations, Duration/Validity
+- "risks": risks and issues grouped under 🔴 HIGH RISK, 🟡 MEDIUM RISK, 🟢 LOW RISK, ⚠️ MISSING
+{lang_note}
 
+Document:
+{text}
 
-# ── Tool 7: Generate report ───────────────────────────────────────────
-@tool
-def generate_report(summary: str, key_info: str, risks: str, filename: str) -> str:
-    """Combine analysis results into a final structured report."""
-    try:
-        prompt = f"""Create a professional document analysis report based on the following:
+JSON:""".format
+
+_REPORT_TMPL = """Create a professional document analysis report based on the following:
 
 SUMMARY:
 {summary}
@@ -201,9 +327,71 @@ RISK ANALYSIS:
 Format as a clean, professional report with clear sections.
 Document: {filename}
 
-Report:"""
-        response = llm.invoke(prompt)
-        return response.content.strip()
+Report:""".format
+
+
+@lru_cache(maxsize=None)
+def _lang_note(language: str, verb: str = "Respond") -> str:
+    """The language reminder appended to analyzer prompts, built once
+    per (language, verb) pair."""
+    return f"\nIMPORTANT: {verb} entirely in {language}." if language != "English" else ""
+
+
+# ── Tool 4: Summarize text ────────────────────────────────────────────
+@tool
+def summarize_text(text: str, language: str = "English") -> str:
+    """Generate a concise summary of the provided text."""
+    try:
+        prompt = _SUMMARIZE_TMPL(text=text[:4000], lang_note=_lang_note(language))
+        return _invoke_llm(prompt, task_tag="summarize")
+    except Exception as e:
+        return f"Error summarizing: {e}"
+
+
+# ── Tool 5: Extract key information ──────────────────────────────────
+@tool
+def extract_key_info(text: str, language: str = "English") -> str:
+    """Extract key information like dates, parties, amounts, and clauses."""
+    try:
+        prompt = _EXTRACT_TMPL(text=text[:4000], lang_note=_lang_note(language))
+        return _invoke_llm(prompt, task_tag="extract")
+    except Exception as e:
+        return f"Error extracting info: {e}"
+
+
+# ── Tool 6: Flag risks ────────────────────────────────────────────────
+@tool
+def flag_risks(text: str, language: str = "English") -> str:
+    """Identify potential risks, red flags, and missing sections."""
+    try:
+        prompt = _RISKS_TMPL(text=text[:4000], lang_note=_lang_note(language))
+        return _invoke_llm(prompt, task_tag="risks")
+    except Exception as e:
+        return f"Error flagging risks: {e}"
+
+
+# ── Tool 6b: Combined analysis (single call) ─────────────────────────
+@tool
+def analyze_document_combined(text: str, language: str = "English") -> str:
+    """Summarize, extract key info, and flag risks in one LLM call.
+    Returns a JSON string with keys: summary, key_info, risks."""
+    try:
+        prompt = _COMBINED_TMPL(text=text[:4000],
+                                lang_note=_lang_note(language, "Write every value"))
+        return _invoke_llm(prompt, client=llm.bind(response_format={"type": "json_object"}),
+                           task_tag="combined")
+    except Exception as e:
+        return f"Error in combined analysis: {e}"
+
+
+# ── Tool 7: Generate report ───────────────────────────────────────────
+@tool
+def generate_report(summary: str, key_info: str, risks: str, filename: str) -> str:
+    """Combine analysis results into a final structured report."""
+    try:
+        prompt = _REPORT_TMPL(summary=summary, key_info=key_info,
+                              risks=risks, filename=filename)
+        return _invoke_llm(prompt, task_tag="report")
     except Exception as e:
         return f"Error generating report: {e}"
 
@@ -216,5 +404,6 @@ all_tools = [
     summarize_text,
     extract_key_info,
     flag_risks,
+    analyze_document_combined,
     generate_report
 ]
\ No newline at end of file